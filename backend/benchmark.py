@@ -0,0 +1,349 @@
+"""
+Scale and memory-footprint benchmark.
+
+Generates synthetic configurations of circuit breakers, telesignals,
+telemetries and tap changers, loads them into the backend in-process (without
+the HTTP or Modbus listeners) and measures:
+
+- RSS after startup and after loading the configuration
+- module import time and configuration import time
+- simulation tick time, with every point due and with none due
+- monitor loop CPU while idle and while registers are being written
+- `get_initial_data` payload size and build/encode latency, with a fresh and
+  a cached snapshot, and the latency of one `get_data_page` page
+
+Each size runs in a fresh interpreter so the numbers do not bleed into each
+other. The report is JSON and can be compared against an earlier run:
+
+    python benchmark.py --points 10000 100000 1000000 --output report.json
+    python benchmark.py --compare report.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_POINTS = [10000, 100000]
+
+# Share of the configured points per collection
+MIX = {
+    "circuit_breakers": 0.1,
+    "telesignals": 0.4,
+    "telemetries": 0.4,
+    "tap_changers": 0.1,
+}
+
+# Register table sizes; generated IOAs wrap around inside them
+COIL_SPAN = 5000
+DISCRETE_SPAN = 5000
+REGISTER_SPAN = 7000
+
+# Metrics compared between reports; all of them are "lower is better"
+COMPARED_METRICS = [
+    "rss_loaded_mb",
+    "config_import_s",
+    "tick_all_due_ms",
+    "tick_none_due_ms",
+    "monitor_idle_cpu",
+    "monitor_writes_cpu",
+    "initial_data_bytes",
+    "initial_data_ms",
+    "initial_data_cached_ms",
+    "data_page_ms",
+]
+
+def _ioa(index: int, span: int) -> int:
+    return index % span + 1
+
+def generate_config(points: int, seed: int = 1) -> Dict[str, List[dict]]:
+    """Synthetic import/export payload with `points` items split according to MIX."""
+    rng = random.Random(seed)
+    counts = {name: int(points * share) for name, share in MIX.items()}
+    counts["telesignals"] += points - sum(counts.values())
+    config: Dict[str, List[dict]] = {name: [] for name in MIX}
+
+    for i in range(counts["circuit_breakers"]):
+        base = i * 5
+        config["circuit_breakers"].append({
+            "id": f"cb-{i}",
+            "name": f"CB {i}",
+            "ioa_cb_status": _ioa(base, DISCRETE_SPAN),
+            "ioa_cb_status_close": _ioa(base + 1, DISCRETE_SPAN),
+            "ioa_cb_status_dp": _ioa(base, REGISTER_SPAN),
+            "ioa_control_open": _ioa(base + 2, COIL_SPAN),
+            "ioa_control_close": _ioa(base + 3, COIL_SPAN),
+            "ioa_control_dp": _ioa(base + 1, REGISTER_SPAN),
+            "ioa_local_remote_sp": _ioa(base + 4, COIL_SPAN),
+            "ioa_local_remote_dp": _ioa(base + 5, COIL_SPAN),
+            "is_sbo": i % 2 == 0,
+            "has_double_point": i % 2 == 0,
+        })
+    for i in range(counts["telesignals"]):
+        config["telesignals"].append({
+            "id": f"ts-{i}",
+            "name": f"TS {i}",
+            "ioa": _ioa(i, COIL_SPAN),
+            "value": rng.randint(0, 1),
+            "interval": 2,
+            "auto_mode": True,
+        })
+    for i in range(counts["telemetries"]):
+        config["telemetries"].append({
+            "id": f"tm-{i}",
+            "name": f"TM {i}",
+            "ioa": _ioa(i, REGISTER_SPAN),
+            "unit": "kV",
+            "value": 150.0,
+            "scale_factor": 0.1,
+            "min_value": 140.0,
+            "max_value": 160.0,
+            "interval": 2,
+            "auto_mode": True,
+        })
+    for i in range(counts["tap_changers"]):
+        base = i * 5
+        config["tap_changers"].append({
+            "id": f"tc-{i}",
+            "name": f"TC {i}",
+            "ioa_value": _ioa(base, REGISTER_SPAN),
+            "value": 8,
+            "value_high_limit": 17,
+            "value_low_limit": 1,
+            "ioa_high_limit": _ioa(base + 1, REGISTER_SPAN),
+            "ioa_low_limit": _ioa(base + 2, REGISTER_SPAN),
+            "ioa_status_raise_lower": _ioa(base + 3, REGISTER_SPAN),
+            "ioa_command_raise_lower": _ioa(base + 4, REGISTER_SPAN),
+            "interval": 2,
+            "auto_mode": True,
+            "ioa_status_auto_manual": _ioa(base, COIL_SPAN),
+            "ioa_command_auto_manual": _ioa(base + 1, COIL_SPAN),
+            "is_local_remote": 2,
+            "ioa_local_remote": _ioa(base + 2, COIL_SPAN),
+        })
+    return config
+
+def rss_mb() -> Dict[str, float]:
+    """Current and peak resident set size in MiB."""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {
+            "rss": int(fields["VmRSS"].split()[0]) / 1024,
+            "peak": int(fields["VmHWM"].split()[0]) / 1024,
+        }
+    except (OSError, KeyError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and KiB elsewhere
+        peak = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+        return {"rss": peak, "peak": peak}
+
+def _median_ms(samples: List[float]) -> float:
+    return round(statistics.median(samples) * 1000, 3)
+
+async def _run_monitor(main, duration: float, write_rate: float, clients: int) -> dict:
+    """
+    Run the real monitor loop for `duration` seconds and report its CPU share.
+    `clients` outbound queues are registered so broadcasts build their snapshots
+    as they would with browsers connected; nothing is sent over the network.
+    """
+    sids = [f"benchmark-{n}" for n in range(clients)]
+    for sid in sids:
+        main.outbound.register(sid)
+    task = asyncio.create_task(main.monitor_modbus_changes())
+    writes = 0
+
+    async def writer():
+        nonlocal writes
+        rng = random.Random(2)
+        while True:
+            main.store.setValues(3, rng.randrange(REGISTER_SPAN), [rng.randint(1400, 1600)])
+            writes += 1
+            await asyncio.sleep(1 / write_rate)
+
+    writer_task = asyncio.create_task(writer()) if write_rate > 0 else None
+    await asyncio.sleep(0)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.sleep(duration)
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+    for t in (task, writer_task):
+        if t:
+            t.cancel()
+    await asyncio.gather(task, *([writer_task] if writer_task else []), return_exceptions=True)
+    for sid in sids:
+        main.outbound.unregister(sid)
+    return {"cpu": round(cpu / wall, 3), "writes": writes}
+
+def run_worker(points: int, args) -> dict:
+    """Measure one configuration size in this interpreter."""
+    os.environ.setdefault("SIM_SEED", "1")
+    start = time.perf_counter()
+    import main
+    module_import_s = time.perf_counter() - start
+    # Per-item INFO logs would measure the log handler rather than the backend
+    logging.disable(logging.INFO)
+    rss_startup = rss_mb()["rss"]
+
+    config = generate_config(points, args.seed)
+    config_bytes = len(json.dumps(config, separators=(",", ":")))
+
+    start = time.perf_counter()
+    asyncio.run(main.import_data("benchmark", config))
+    config_import_s = time.perf_counter() - start
+    del config
+    memory = rss_mb()
+    loaded = {name: len(getattr(main, name)) for name in MIX}
+
+    # Simulation tick with every auto-mode point due, then with none due
+    last_update_times = {name: {} for name in MIX}
+    now = 1000.0
+    all_due, none_due = [], []
+    for _ in range(args.ticks):
+        now += 1000.0
+        start = time.perf_counter()
+        main.simulation_tick(now, last_update_times)
+        all_due.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        main.simulation_tick(now + 0.1, last_update_times)
+        none_due.append(time.perf_counter() - start)
+
+    monitor_idle = asyncio.run(_run_monitor(main, args.duration, 0, args.clients))
+    monitor_writes = asyncio.run(_run_monitor(main, args.duration, args.write_rate, args.clients))
+
+    # What a connecting client costs: building the snapshot and Socket.IO's JSON encoding.
+    # The first build after a change serializes every item, later ones reuse the snapshot.
+    build, cached, encode, page = [], [], [], []
+    payload_bytes = 0
+    for _ in range(args.ticks):
+        for name in MIX:
+            main.snapshots.touch(name)
+        start = time.perf_counter()
+        data = main.initial_data()
+        build.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        data = main.initial_data()
+        cached.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        payload_bytes = len(json.dumps(data, separators=(",", ":")))
+        encode.append(time.perf_counter() - start)
+        del data
+        start = time.perf_counter()
+        json.dumps(main.snapshots.page("telemetries", 1), separators=(",", ":"))
+        page.append(time.perf_counter() - start)
+
+    return {
+        "points": points,
+        "items": loaded,
+        "config_bytes": config_bytes,
+        "module_import_s": round(module_import_s, 3),
+        "config_import_s": round(config_import_s, 3),
+        "rss_startup_mb": round(rss_startup, 1),
+        "rss_loaded_mb": round(memory["rss"], 1),
+        "rss_peak_mb": round(rss_mb()["peak"], 1),
+        "tick_all_due_ms": _median_ms(all_due),
+        "tick_none_due_ms": _median_ms(none_due),
+        "monitor_idle_cpu": monitor_idle["cpu"],
+        "monitor_writes_cpu": monitor_writes["cpu"],
+        "monitor_writes": monitor_writes["writes"],
+        "initial_data_bytes": payload_bytes,
+        "initial_data_build_ms": _median_ms(build),
+        "initial_data_encode_ms": _median_ms(encode),
+        "initial_data_ms": round(_median_ms(build) + _median_ms(encode), 3),
+        "initial_data_cached_ms": round(_median_ms(cached) + _median_ms(encode), 3),
+        "data_page_ms": _median_ms(page),
+    }
+
+def run_isolated(points: int, args) -> dict:
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", str(points),
+        "--ticks", str(args.ticks), "--duration", str(args.duration),
+        "--write-rate", str(args.write_rate), "--clients", str(args.clients), "--seed", str(args.seed),
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark for {points} points failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def compare(report: dict, baseline: dict, threshold: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than `threshold` (a ratio, e.g. 0.2)."""
+    regressions = []
+    previous = {result["points"]: result for result in baseline.get("results", [])}
+    for result in report["results"]:
+        before = previous.get(result["points"])
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            print(f"{result['points']:>9} {metric:<22} {old:>12} -> {new:<12} {change:+.1%}")
+            if change > threshold:
+                regressions.append(f"{result['points']} points: {metric} {old} -> {new} ({change:+.1%})")
+    return regressions
+
+def print_table(results: List[dict]):
+    columns = ["points", "rss_loaded_mb", "config_import_s", "tick_all_due_ms", "tick_none_due_ms",
+               "monitor_idle_cpu", "monitor_writes_cpu", "initial_data_bytes", "initial_data_ms"]
+    print(" ".join(f"{column:>18}" for column in columns))
+    for result in results:
+        print(" ".join(f"{result[column]:>18}" for column in columns))
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scale and memory-footprint benchmark for the simulator backend")
+    parser.add_argument("--points", type=int, nargs="+", default=DEFAULT_POINTS, help="Configuration sizes to measure")
+    parser.add_argument("--ticks", type=int, default=5, help="Repetitions of the tick and initial data measurements")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds the monitor loop runs per measurement")
+    parser.add_argument("--write-rate", type=float, default=100.0, help="Register writes per second during the monitor measurement")
+    parser.add_argument("--clients", type=int, default=1, help="Simulated Socket.IO clients during the monitor measurement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative increase reported as a regression")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(args.worker, args)))
+        return 0
+
+    from pymodbus import __version__ as pymodbus_version
+    from pydantic import VERSION as pydantic_version
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pymodbus": pymodbus_version,
+        "pydantic": pydantic_version,
+        "settings": {"ticks": args.ticks, "duration": args.duration, "write_rate": args.write_rate,
+                     "clients": args.clients, "seed": args.seed, "mix": MIX},
+        "results": [],
+    }
+    for points in args.points:
+        print(f"Measuring {points} points...", file=sys.stderr)
+        report["results"].append(run_isolated(points, args))
+
+    print_table(report["results"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import ipaddress
+import struct
+import threading
+import time
+from typing import Iterator, Optional, Set, Tuple
+
+# One transaction: wall time, client IP (IPv6 or IPv4-mapped), client port, unit,
+# function code, address, count, result, flags, service time in microseconds
+RECORD = struct.Struct('<d16sHBBHHBBI')
+
+RESULT_OK = 0  # 1..11 are Modbus exception codes
+RESULT_CLOSED = 0xFD
+RESULT_NO_RESPONSE = 0xFE
+
+FLAG_CACHE_HIT = 0x01
+FLAG_FAULT = 0x02
+
+FILE_MAGIC = b'MBCAP1'
+
+class CaptureFilter:
+    """Criteria a transaction must match; every criterion left as None matches all."""
+
+    def __init__(self, units: Optional[Set[int]] = None, function_codes: Optional[Set[int]] = None,
+                 client: Optional[str] = None, address_from: Optional[int] = None, address_to: Optional[int] = None):
+        self.units = units
+        self.function_codes = function_codes
+        self.client = _pack_ip(client) if client else None
+        self.address_from = address_from
+        self.address_to = address_to
+
+    def matches(self, ip: bytes, unit: int, fc: int, address: int, count: int) -> bool:
+        if self.units is not None and unit not in self.units:
+            return False
+        if self.function_codes is not None and fc not in self.function_codes:
+            return False
+        if self.client is not None and ip != self.client:
+            return False
+        if self.address_from is not None and address + max(count, 1) - 1 < self.address_from:
+            return False
+        if self.address_to is not None and address > self.address_to:
+            return False
+        return True
+
+    def describe(self) -> dict:
+        return {
+            "units": sorted(self.units) if self.units is not None else None,
+            "function_codes": sorted(self.function_codes) if self.function_codes is not None else None,
+            "client": _format_ip(self.client) if self.client else None,
+            "address_from": self.address_from,
+            "address_to": self.address_to,
+        }
+
+def _pack_ip(host: str) -> bytes:
+    ip = ipaddress.ip_address(host)
+    if ip.version == 4:
+        return ipaddress.IPv6Address(f"::ffff:{ip}").packed
+    return ip.packed
+
+def _format_ip(packed: bytes) -> str:
+    ip = ipaddress.IPv6Address(packed)
+    return str(ip.ipv4_mapped or ip)
+
+class TransactionCapture:
+    """
+    Fixed-size binary ring buffer of Modbus transactions.
+
+    Records are packed with `RECORD` into one preallocated bytearray, so capturing
+    costs a filter check and a single `pack_into` per request. Capture can be
+    switched on and off and refiltered at runtime; the oldest records are
+    overwritten once the buffer is full.
+    """
+
+    def __init__(self, capacity: int = 100000, enabled: bool = False):
+        self.enabled = enabled
+        self.filter = CaptureFilter()
+        self._lock = threading.Lock()
+        self._ip_cache = {}
+        self.resize(capacity)
+
+    def resize(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        with self._lock:
+            self.capacity = capacity
+            self._buffer = bytearray(self.capacity * RECORD.size)
+            self._head = 0
+            self._count = 0
+            self.recorded = 0
+
+    def clear(self):
+        self.resize(self.capacity)
+
+    def record(self, peer: Optional[Tuple], unit: int, fc: int, address: int, count: int,
+               result: int, flags: int, service_time: float):
+        host, port = (peer[0], peer[1]) if peer else ("::", 0)
+        ip = self._ip_cache.get(host)
+        if ip is None:
+            ip = self._ip_cache[host] = _pack_ip(host)
+        if not self.filter.matches(ip, unit, fc, address, count):
+            return
+        with self._lock:
+            RECORD.pack_into(
+                self._buffer, self._head * RECORD.size,
+                time.time(), ip, port & 0xFFFF, unit & 0xFF, fc & 0xFF, address & 0xFFFF, count & 0xFFFF,
+                result & 0xFF, flags & 0xFF, min(int(service_time * 1_000_000), 0xFFFFFFFF),
+            )
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            self.recorded += 1
+
+    def snapshot(self) -> bytes:
+        """Copy of the stored records, oldest first."""
+        with self._lock:
+            start = (self._head - self._count) % self.capacity * RECORD.size
+            end = self._head * RECORD.size
+            if self._count < self.capacity and start < end:
+                return bytes(self._buffer[start:end])
+            if self._count == 0:
+                return b''
+            return bytes(self._buffer[start:]) + bytes(self._buffer[:end])
+
+    def records(self, criteria: Optional[CaptureFilter] = None) -> Iterator[tuple]:
+        for record in RECORD.iter_unpack(self.snapshot()):
+            if criteria is None or criteria.matches(record[1], record[3], record[4], record[5], record[6]):
+                yield record
+
+    def export_binary(self, criteria: Optional[CaptureFilter] = None) -> bytes:
+        """File header (magic, record format, record size) followed by packed records."""
+        fmt = RECORD.format.encode() if isinstance(RECORD.format, str) else RECORD.format
+        header = FILE_MAGIC + struct.pack('<B', len(fmt)) + fmt + struct.pack('<H', RECORD.size)
+        if criteria is None:
+            return header + self.snapshot()
+        return header + b''.join(RECORD.pack(*record) for record in self.records(criteria))
+
+    def export_csv(self, criteria: Optional[CaptureFilter] = None) -> str:
+        lines = ["timestamp,client,port,unit,function_code,address,count,result,flags,service_us"]
+        for ts, ip, port, unit, fc, address, count, result, flags, service_us in self.records(criteria):
+            lines.append(f"{ts:.6f},{_format_ip(ip)},{port},{unit},{fc},{address},{count},{result},{flags},{service_us}")
+        return "\n".join(lines) + "\n"
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "stored": self._count,
+            "recorded": self.recorded,
+            "record_size": RECORD.size,
+            "filter": self.filter.describe(),
+        }
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 class CircuitBreakerItem(BaseModel):
     id: str
@@ -67,9 +67,11 @@ class TapChangerItem(BaseModel):
     
     ioa_status_raise_lower: int  # 1: lower, 2: raise, 0: neutral
     ioa_command_raise_lower: int
+    status_raise_lower: int = 0
+    travel_time: float = 1.0  # Seconds for the mechanism to complete one step
     
     interval: int = 1
-    auto_mode: int = 2  # 1: manual, 2: auto
+    auto_mode: bool = True  # True: auto, False: manual
     ioa_status_auto_manual: int
     ioa_command_auto_manual: int
     
@@ -82,5 +84,75 @@ class TapChangerItem(BaseModel):
       'CircuitBreakerItem',
       'TeleSignalItem',
       'TelemetryItem',
-      'TapChangerItem'
-    ]
\ No newline at end of file
+      'TapChangerItem',
+      'RegisterWrite',
+      'RegisterWriteBatch',
+      'ClockSettings',
+      'CaptureSettings',
+      'FaultRule',
+      'TemplateItem',
+      'DeviceTemplate',
+      'TemplateInstantiation'
+    ]
+
+
+class RegisterWrite(BaseModel):
+    table: str  # coils, discrete_inputs, holding_registers, input_registers
+    start: int  # First IOA of the range
+    values: List[int]
+
+class RegisterWriteBatch(BaseModel):
+    writes: List[RegisterWrite]
+
+class ClockSettings(BaseModel):
+    mode: Optional[str] = None  # realtime, accelerated, discrete
+    speed: Optional[float] = None  # Simulated seconds per wall-clock second
+    seed: Optional[int] = None
+
+class CaptureSettings(BaseModel):
+    enabled: Optional[bool] = None
+    capacity: Optional[int] = None  # Number of transactions kept; resizing clears the buffer
+    clear: bool = False
+    # Capture filter; fields left out keep their current criterion, null matches everything
+    units: Optional[List[int]] = None
+    function_codes: Optional[List[int]] = None
+    client: Optional[str] = None
+    address_from: Optional[int] = None
+    address_to: Optional[int] = None
+
+class FaultRule(BaseModel):
+    id: Optional[str] = None
+    enabled: bool = True
+    # Match criteria; None matches any unit/function code. Addresses are wire addresses (IOA - 1)
+    unit: Optional[int] = None
+    function_code: Optional[int] = None
+    address_from: int = 0
+    address_to: int = 65535
+    # Latency added before the request is served
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    distribution: str = "fixed"  # fixed, uniform, normal, exponential
+    # Probabilities (0-1) of failing the request, checked in this order
+    close_rate: float = 0
+    drop_rate: float = 0
+    exception_rate: float = 0
+    exception_code: int = 4  # Slave device failure
+
+class TemplateItem(BaseModel):
+    type: str  # circuit_breaker, telesignal, telemetry, tap_changer
+    name: str
+    offsets: Dict[str, int]  # IOA field -> offset from the instance base address
+    fields: Dict[str, Any] = {}  # Every other field of the item
+
+class DeviceTemplate(BaseModel):
+    name: str
+    description: str = ""
+    items: List[TemplateItem]
+
+class TemplateInstantiation(BaseModel):
+    count: int = 1
+    base_address: int = 1  # IOA of offset 0 in the first instance, in every table
+    stride: Optional[int] = None  # IOAs between instances; defaults to the template's address span
+    unit_id: int = 1
+    name: Optional[str] = None  # Instance name prefix; defaults to the template name
+    first_number: int = 1
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def format_stack(frame, limit: int = 64) -> List[str]:
+    """Frames of a stack from root to leaf as `function (file:line)`."""
+    frames = []
+    while frame is not None and len(frames) < limit:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+class LoopWatchdog:
+    """
+    Continuous event-loop lag measurement.
+
+    A task on the loop wakes every `interval` seconds and records how late it
+    woke up. A separate thread checks the task's heartbeat; when the loop has
+    been stuck for longer than `threshold`, it takes a stack sample of the
+    loop thread while the stall is still happening, so the culprit is captured.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.2, max_samples: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = deque(maxlen=max_samples)
+        self.loop_thread_id: Optional[int] = None
+        self.heartbeat = time.monotonic()
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.ticks = 0
+        self.stalls = 0
+        self._stop = threading.Event()
+
+    async def run(self):
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        thread = threading.Thread(target=self._watch, daemon=True, name="loop-watchdog")
+        thread.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self.heartbeat = now
+                lag = max(now - expected, 0.0)
+                self.last_lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self.total_lag += lag
+                self.ticks += 1
+        finally:
+            self._stop.set()
+
+    def _watch(self):
+        sampled_heartbeat = None
+        while not self._stop.wait(self.interval / 2):
+            heartbeat = self.heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or heartbeat == sampled_heartbeat:
+                continue
+            # One sample per stall: the heartbeat doesn't move until the loop recovers
+            sampled_heartbeat = heartbeat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = format_stack(frame) if frame else []
+            self.stalls += 1
+            self.samples.append({"time": time.time(), "lag_ms": round(stalled * 1000, 1), "stack": stack})
+            logger.warning(f"Event loop stalled for {stalled * 1000:.0f} ms in {stack[-1] if stack else 'unknown'}")
+
+    def stats(self) -> dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "mean_lag_ms": round(self.total_lag / self.ticks * 1000, 3) if self.ticks else 0.0,
+            "stalls": self.stalls,
+            "samples": list(self.samples),
+        }
+
+def sample_profile(threads: Dict[str, int], seconds: float, interval: float) -> str:
+    """
+    Sample the stacks of the given threads (name -> thread id) for `seconds` and
+    return them in collapsed-stack format (`thread;frame;frame count` per line),
+    which flamegraph.pl, speedscope and similar tools read directly.
+    """
+    counts: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frames = sys._current_frames()
+        for name, thread_id in threads.items():
+            frame = frames.get(thread_id)
+            if frame is not None:
+                counts[";".join([name] + format_stack(frame))] += 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,186 @@
+import itertools
+import random
+from bisect import bisect_right
+from typing import Dict, List, Optional, Set, Tuple
+from data_models import FaultRule
+
+ADDRESS_SPACE = 65536
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "exponential")
+
+FAULT_NONE = None
+FAULT_DROP = "drop"
+FAULT_EXCEPTION = "exception"
+FAULT_CLOSE = "close"
+
+class RuleBucket:
+    """
+    Rules for one (unit, function code) pair, compiled into address segments.
+
+    `starts` holds the sorted first address of every segment and `rule_sets`
+    the rules covering each segment, so a lookup is a bisect to the segment of
+    the first address and then a walk over the segments the request overlaps.
+    Lookup cost does not depend on how many rules exist, and memory grows with
+    the number of rule boundaries rather than the address space.
+    """
+
+    def __init__(self, rules: List[Tuple[int, FaultRule]]):
+        starts: Dict[int, List[Tuple[int, FaultRule]]] = {}
+        ends: Dict[int, List[Tuple[int, FaultRule]]] = {}
+        for entry in rules:
+            starts.setdefault(entry[1].address_from, []).append(entry)
+            ends.setdefault(entry[1].address_to + 1, []).append(entry)
+        edges = sorted({0, ADDRESS_SPACE} | starts.keys() | ends.keys())
+
+        self.starts: List[int] = []
+        self.rule_sets: List[Tuple[Tuple[int, FaultRule], ...]] = []
+        active: Dict[int, Tuple[int, FaultRule]] = {}
+        for start in edges[:-1]:
+            for order, _ in ends.get(start, ()):
+                active.pop(order, None)
+            for entry in starts.get(start, ()):
+                active[entry[0]] = entry
+            self.starts.append(start)
+            self.rule_sets.append(tuple(active[order] for order in sorted(active)))
+
+    def collect(self, address: int, count: int, found: Dict[str, Tuple[int, FaultRule]]):
+        end = min(address + count, ADDRESS_SPACE)
+        segment = bisect_right(self.starts, address) - 1
+        while segment < len(self.starts) and self.starts[segment] < end:
+            for entry in self.rule_sets[segment]:
+                found[entry[1].id] = entry
+            segment += 1
+
+class FaultInjector:
+    """
+    Latency, dropped responses, exception responses and connection closes for
+    Modbus requests, selected by unit, function code and address range.
+
+    Rules are compiled into per-(unit, function code) buckets, and a change only
+    recompiles the buckets of the rules it touches. Lookups only read the
+    compiled snapshot. A request therefore checks at most four buckets (exact
+    and wildcard unit/function code), however many rules are configured.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.rules: Dict[str, FaultRule] = {}
+        self._ids = itertools.count(1)
+        self._orders: Dict[str, int] = {}  # rule id -> position in which matching rules apply
+        self._next_order = itertools.count()
+        self._index: Dict[Tuple[Optional[int], Optional[int]], RuleBucket] = {}
+        self.stats = {"matched": 0, "delayed": 0, "dropped": 0, "exceptions": 0, "closed": 0}
+
+    @property
+    def active(self) -> bool:
+        return bool(self._index)
+
+    def add_rule(self, rule: FaultRule) -> FaultRule:
+        validate_rule(rule)
+        if not rule.id:
+            rule.id = str(next(self._ids))
+            while rule.id in self.rules:
+                rule.id = str(next(self._ids))
+        keys = {(rule.unit, rule.function_code)}
+        replaced = self.rules.get(rule.id)
+        if replaced is not None:
+            keys.add((replaced.unit, replaced.function_code))
+        else:
+            self._orders[rule.id] = next(self._next_order)
+        self.rules[rule.id] = rule
+        self._compile(keys)
+        return rule
+
+    def replace_rules(self, rules: List[FaultRule]):
+        for rule in rules:
+            validate_rule(rule)
+        self.rules = {}
+        for rule in rules:
+            if not rule.id:
+                rule.id = str(next(self._ids))
+            self.rules[rule.id] = rule
+        self._orders = {rule_id: next(self._next_order) for rule_id in self.rules}
+        self._compile()
+
+    def remove_rule(self, rule_id: str) -> bool:
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        del self._orders[rule_id]
+        self._compile({(rule.unit, rule.function_code)})
+        return True
+
+    def _compile(self, keys: Optional[Set[Tuple[Optional[int], Optional[int]]]] = None):
+        """Rebuild the buckets for `keys`, or all buckets."""
+        grouped: Dict[Tuple[Optional[int], Optional[int]], List[Tuple[int, FaultRule]]] = {}
+        for rule_id, rule in self.rules.items():
+            key = (rule.unit, rule.function_code)
+            if rule.enabled and (keys is None or key in keys):
+                grouped.setdefault(key, []).append((self._orders[rule_id], rule))
+        index = {} if keys is None else dict(self._index)
+        for key in (grouped.keys() if keys is None else keys):
+            if key in grouped:
+                index[key] = RuleBucket(grouped[key])
+            else:
+                index.pop(key, None)
+        # Swap in a complete index in one assignment; the Modbus thread may be reading the old one
+        self._index = index
+
+    def evaluate(self, unit: int, function_code: int, address: int, count: int) -> Optional[Tuple[float, Optional[str], int]]:
+        """Return (delay in seconds, action, exception code) for a request, or None if no rule matches."""
+        index = self._index
+        if not index:
+            return None
+        found: Dict[str, Tuple[int, FaultRule]] = {}
+        for key in ((unit, function_code), (unit, None), (None, function_code), (None, None)):
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.collect(address, count, found)
+        if not found:
+            return None
+
+        self.stats["matched"] += 1
+        rng = self.random
+        delay = 0.0
+        for _, rule in sorted(found.values(), key=lambda entry: entry[0]):
+            delay += sample_latency(rule, rng)
+            if rule.close_rate and rng.random() < rule.close_rate:
+                self.stats["closed"] += 1
+                return delay, FAULT_CLOSE, 0
+            if rule.drop_rate and rng.random() < rule.drop_rate:
+                self.stats["dropped"] += 1
+                return delay, FAULT_DROP, 0
+            if rule.exception_rate and rng.random() < rule.exception_rate:
+                self.stats["exceptions"] += 1
+                return delay, FAULT_EXCEPTION, rule.exception_code
+        if delay > 0:
+            self.stats["delayed"] += 1
+        return delay, FAULT_NONE, 0
+
+    def status(self) -> dict:
+        return {"rules": [rule.model_dump() for rule in self.rules.values()], "stats": dict(self.stats)}
+
+def sample_latency(rule: FaultRule, rng: random.Random) -> float:
+    """Latency in seconds drawn from the rule's distribution."""
+    latency = rule.latency_ms
+    if rule.jitter_ms > 0:
+        if rule.distribution == "uniform":
+            latency += rng.uniform(-rule.jitter_ms, rule.jitter_ms)
+        elif rule.distribution == "normal":
+            latency = rng.gauss(latency, rule.jitter_ms)
+        elif rule.distribution == "exponential":
+            latency += rng.expovariate(1.0 / rule.jitter_ms)
+    return max(latency, 0.0) / 1000
+
+def validate_rule(rule: FaultRule):
+    """Raise ValueError if a rule cannot be compiled."""
+    if not 0 <= rule.address_from <= rule.address_to < ADDRESS_SPACE:
+        raise ValueError(f"Invalid address range {rule.address_from}..{rule.address_to}")
+    if rule.distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{rule.distribution}', expected one of {', '.join(DISTRIBUTIONS)}")
+    for name in ("drop_rate", "exception_rate", "close_rate"):
+        if not 0 <= getattr(rule, name) <= 1:
+            raise ValueError(f"{name} must be between 0 and 1")
+    if rule.latency_ms < 0 or rule.jitter_ms < 0:
+        raise ValueError("latency_ms and jitter_ms must not be negative")
+    if not 1 <= rule.exception_code <= 0xFF:
+        raise ValueError("exception_code must be between 1 and 255")
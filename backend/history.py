@@ -0,0 +1,138 @@
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PointKey = Tuple[str, str]  # (collection, item id), e.g. ("telemetries", "1747884050882")
+
+class HistoryRing:
+    """Fixed-size circular buffer of (timestamp, value) samples in two typed arrays."""
+
+    __slots__ = ("times", "values", "capacity", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.head = 0  # next slot to write
+        self.count = 0
+
+    def append(self, timestamp: float, value: float):
+        self.times[self.head] = timestamp
+        self.values[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def _slot(self, i: int) -> int:
+        """Physical slot of the i-th oldest sample."""
+        return (self.head - self.count + i) % self.capacity
+
+    def _first_at_or_after(self, timestamp: float) -> int:
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.times[self._slot(mid)] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def window(self, start: Optional[float], end: Optional[float], max_points: int) -> dict:
+        """
+        Samples with start <= t <= end (None means the oldest/newest sample). If there
+        are more than `max_points`, the window is split into equal time buckets
+        reporting the last, min and max value.
+        """
+        if self.count == 0:
+            return {"t": [], "v": [], "min": [], "max": []}
+        if start is None:
+            start = self.times[self._slot(0)]
+        if end is None:
+            end = self.times[self._slot(self.count - 1)]
+
+        first = self._first_at_or_after(start)
+        last = self._first_at_or_after(end)
+        while last < self.count and self.times[self._slot(last)] <= end:
+            last += 1
+
+        slots = [self._slot(i) for i in range(first, last)]
+        if len(slots) <= max_points:
+            values = [self.values[s] for s in slots]
+            return {"t": [self.times[s] for s in slots], "v": values, "min": values, "max": values}
+
+        result = {"t": [], "v": [], "min": [], "max": []}
+        bucket_width = (end - start) / max_points or 1.0
+        bucket = -1
+        for s in slots:
+            t, v = self.times[s], self.values[s]
+            index = min(int((t - start) / bucket_width), max_points - 1)
+            if index != bucket:
+                bucket = index
+                result["t"].append(t)
+                result["v"].append(v)
+                result["min"].append(v)
+                result["max"].append(v)
+            else:
+                result["v"][-1] = v
+                if v < result["min"][-1]:
+                    result["min"][-1] = v
+                if v > result["max"][-1]:
+                    result["max"][-1] = v
+        return result
+
+class HistoryStore:
+    """
+    Per-point value history for telesignals and telemetries.
+
+    Every point gets a ring of `capacity` samples the first time it records a
+    value, and at most `max_points` points are tracked, so memory never exceeds
+    max_points * capacity * 16 bytes.
+    """
+
+    def __init__(self, capacity: int = 1000, max_points: int = 5000):
+        self.capacity = capacity
+        self.max_points = max_points
+        self.rings: Dict[PointKey, HistoryRing] = {}
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def record(self, collection: str, item_id: str, timestamp: float, value: float):
+        key = (collection, item_id)
+        with self._lock:
+            ring = self.rings.get(key)
+            if ring is None:
+                if self.capacity <= 0 or len(self.rings) >= self.max_points:
+                    if not self._warned:
+                        logger.warning(f"History limit of {self.max_points} points reached, new points are not recorded")
+                        self._warned = True
+                    return
+                ring = self.rings[key] = HistoryRing(self.capacity)
+            ring.append(timestamp, value)
+
+    def discard(self, collection: str, item_id: str):
+        with self._lock:
+            self.rings.pop((collection, item_id), None)
+
+    def clear(self):
+        with self._lock:
+            self.rings.clear()
+            self._warned = False
+
+    def query(self, points: List[PointKey], start: Optional[float], end: Optional[float], max_points: int) -> Dict[str, Optional[dict]]:
+        result = {}
+        with self._lock:
+            for collection, item_id in points:
+                ring = self.rings.get((collection, item_id))
+                result[f"{collection}:{item_id}"] = ring.window(start, end, max_points) if ring else None
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "points": len(self.rings),
+            "max_points": self.max_points,
+            "capacity": self.capacity,
+            "bytes": len(self.rings) * self.capacity * 16,
+        }
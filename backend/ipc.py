@@ -0,0 +1,210 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import struct
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Every message is a JSON object preceded by its length
+HEADER = struct.Struct('>I')
+MAX_FRAME = 512 * 1024 * 1024
+
+def encode_frame(message: dict) -> bytes:
+    payload = json.dumps(message, separators=(',', ':')).encode()
+    return HEADER.pack(len(payload)) + payload
+
+async def read_frame(reader: asyncio.StreamReader) -> dict:
+    header = await reader.readexactly(HEADER.size)
+    (length,) = HEADER.unpack(header)
+    if length > MAX_FRAME:
+        raise ValueError(f"Frame of {length} bytes exceeds the limit of {MAX_FRAME}")
+    return json.loads(await reader.readexactly(length))
+
+class BusServer:
+    """
+    Message bus endpoint of the simulation process, on a Unix socket.
+
+    API workers connect to it to send requests (`{"type": "request", "id",
+    "method", "params"}`, answered with a `reply`) and to receive everything
+    passed to `publish`. A published message is encoded once and written to all
+    workers. A worker whose socket buffer exceeds `max_buffer` bytes is
+    disconnected rather than slowing the simulation down; it reconnects and
+    resynchronizes on its own.
+    """
+
+    def __init__(self, path: str, handlers: Dict[str, Callable[[dict], Awaitable[Any]]], max_buffer: int = 64 * 1024 * 1024):
+        self.path = path
+        self.handlers = handlers
+        self.max_buffer = max_buffer
+        self.writers: Set[asyncio.StreamWriter] = set()
+        self.published = 0
+        self.requests = 0
+        self.disconnected_slow = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self.writers)
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over from a previous run
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        logger.info(f"Message bus listening on {self.path}")
+
+    async def close(self):
+        for writer in list(self.writers):
+            writer.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writers.add(writer)
+        logger.info(f"API worker connected to the message bus ({len(self.writers)} connected)")
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message.get("type") == "request":
+                    asyncio.create_task(self._handle(writer, message))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Error reading from API worker: {e}")
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+            logger.info(f"API worker disconnected from the message bus ({len(self.writers)} connected)")
+
+    async def _handle(self, writer: asyncio.StreamWriter, message: dict):
+        self.requests += 1
+        reply = {"type": "reply", "id": message.get("id")}
+        handler = self.handlers.get(message.get("method"))
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown method '{message.get('method')}'")
+            reply["result"] = await handler(message.get("params") or {})
+        except Exception as e:
+            reply["error"] = str(e)
+        self._write(writer, encode_frame(reply))
+
+    def _write(self, writer: asyncio.StreamWriter, frame: bytes):
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            logger.warning("API worker is not keeping up with the message bus, disconnecting it")
+            self.disconnected_slow += 1
+            self.writers.discard(writer)
+            writer.close()
+            return
+        writer.write(frame)
+
+    def publish(self, message: dict):
+        if not self.writers:
+            return
+        frame = encode_frame(message)
+        for writer in list(self.writers):
+            self._write(writer, frame)
+        self.published += 1
+
+    def stats(self) -> dict:
+        return {
+            "role": "simulator",
+            "path": self.path,
+            "workers": len(self.writers),
+            "published": self.published,
+            "requests": self.requests,
+            "disconnected_slow": self.disconnected_slow,
+        }
+
+class BusClient:
+    """
+    Message bus endpoint of an API worker.
+
+    `run` keeps a connection to the simulation process open, reconnecting when
+    it is lost, and calls `on_connect` after every (re)connect so the worker can
+    resynchronize. Published messages are passed to `on_message`.
+    """
+
+    def __init__(self, path: str, on_message: Callable[[dict], None], on_connect: Callable[[], Awaitable[None]],
+                 retry_interval: float = 1.0, timeout: float = 30.0):
+        self.path = path
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.connected = False
+        self.received = 0
+        self.requests = 0
+        self.reconnects = 0
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+
+    async def run(self):
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionError) as e:
+                logger.warning(f"Message bus at {self.path} is not available ({e}), retrying")
+                await asyncio.sleep(self.retry_interval)
+                continue
+
+            self.connected = True
+            logger.info(f"Connected to the message bus at {self.path}")
+            sync = asyncio.create_task(self.on_connect())
+            try:
+                while True:
+                    message = await read_frame(reader)
+                    self.received += 1
+                    if message.get("type") == "reply":
+                        future = self._pending.pop(message.get("id"), None)
+                        if future and not future.done():
+                            future.set_result(message)
+                    else:
+                        self.on_message(message)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                logger.warning("Lost the connection to the message bus, reconnecting")
+            finally:
+                sync.cancel()
+                self.connected = False
+                self._writer.close()
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("Message bus connection lost"))
+                self._pending.clear()
+            self.reconnects += 1
+            await asyncio.sleep(self.retry_interval)
+
+    async def request(self, method: str, params: Optional[dict] = None) -> Any:
+        """Call `method` in the simulation process and return its result."""
+        if not self.connected or self._writer is None:
+            raise ConnectionError("Not connected to the message bus")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.requests += 1
+        self._writer.write(encode_frame({"type": "request", "id": request_id, "method": method, "params": params or {}}))
+        try:
+            reply = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply.get("result")
+
+    def stats(self) -> dict:
+        return {
+            "role": "worker",
+            "path": self.path,
+            "connected": self.connected,
+            "received": self.received,
+            "requests": self.requests,
+            "reconnects": self.reconnects,
+            "pending": len(self._pending),
+        }
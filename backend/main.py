@@ -1,24 +1,40 @@
 import asyncio
+import itertools
 import math
-import threading
+import subprocess
+import sys
 import time
-from typing import Dict
-from fastapi import FastAPI
+import threading
+from typing import Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import socketio
-from pymodbus.server import StartTcpServer, ServerStop
-from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
+from pymodbus.server import ServerStop
+from pymodbus.datastore import ModbusServerContext
 from pymodbus.datastore import ModbusSequentialDataBlock
 from pymodbus import FramerType
 from pymodbus.device import ModbusDeviceIdentification
-import random
 from dotenv import load_dotenv
 import os
 import logging
 from contextlib import asynccontextmanager
 import uvicorn
 from pydantic import BaseModel
-from data_models import CircuitBreakerItem, TeleSignalItem, TelemetryItem, TapChangerItem
+from data_models import CircuitBreakerItem, TeleSignalItem, TelemetryItem, TapChangerItem, RegisterWriteBatch, ClockSettings, CaptureSettings, FaultRule, DeviceTemplate, TemplateInstantiation
+from register_store import SimulatorSlaveContext, resolve_table, check_range, check_values, pack_values
+from response_cache import ReadResponseCache
+from outbound import OutboundBroadcaster
+from history import HistoryStore
+from modbus_server import SimulatorTcpServer
+from capture import CaptureFilter, TransactionCapture
+from faults import FaultInjector
+from diagnostics import LoopWatchdog, sample_profile
+from sim_clock import SimulationClock
+from tap_changer import TapChangerEngine
+from snapshots import CollectionSnapshots
+from ipc import BusClient, BusServer
+from templates import TemplateLibrary, occupied_addresses
 from pymodbus import __version__ as pymodbus_version
 
 # MODBUS MAPPING
@@ -41,9 +57,35 @@ FASTAPI_HOST = os.getenv("FASTAPI_HOST")
 FASTAPI_PORT = int(os.getenv("FASTAPI_PORT"))
 MODBUS_HOST = os.getenv("MODBUS_HOST")
 MODBUS_PORT = int(os.getenv("MODBUS_PORT"))
+MODBUS_RESPONSE_CACHE_SIZE = int(os.getenv("MODBUS_RESPONSE_CACHE_SIZE", "1024"))
+MODBUS_CAPTURE_SIZE = int(os.getenv("MODBUS_CAPTURE_SIZE", "100000"))
+MODBUS_CAPTURE_ENABLED = os.getenv("MODBUS_CAPTURE_ENABLED", "false").lower() == "true"
+SOCKETIO_QUEUE_DEPTH = int(os.getenv("SOCKETIO_QUEUE_DEPTH", "32"))
+HISTORY_SIZE = int(os.getenv("HISTORY_SIZE", "1000"))
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "5000"))
+LOOP_LAG_THRESHOLD_MS = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "200"))
+SNAPSHOT_PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "500"))
+# standalone: everything in one process; simulator: owns the simulation and Modbus
+# server and serves API workers over the message bus; worker: Socket.IO/HTTP only
+SIM_ROLE = os.getenv("SIM_ROLE", "standalone")
+SIM_BUS_PATH = os.getenv("SIM_BUS_PATH", "/tmp/modbus-simulator.sock")
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+SIMULATOR_API_PORT = int(os.getenv("SIMULATOR_API_PORT", str(FASTAPI_PORT + 1)))
+SIM_CLOCK_MODE = os.getenv("SIM_CLOCK_MODE", "realtime")
+SIM_SPEED = float(os.getenv("SIM_SPEED", "1"))
+SIM_SEED = int(os.getenv("SIM_SEED")) if os.getenv("SIM_SEED") else None
+
+if SIM_ROLE not in ("standalone", "simulator", "worker"):
+    raise ValueError(f"Unknown SIM_ROLE '{SIM_ROLE}', expected standalone, simulator or worker")
 
 app = FastAPI()
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+# Polling requests of one session must reach the same process, which API workers sharing a port
+# cannot guarantee, so workers only accept WebSocket connections
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*',
+                           transports=['websocket'] if SIM_ROLE == "worker" else None)
+
+# Bounded per-client queues so emits never block the simulation on slow clients
+outbound = OutboundBroadcaster(sio, SOCKETIO_QUEUE_DEPTH)
 
 app.add_middleware(
     CORSMiddleware,
@@ -59,44 +101,134 @@ telesignals: Dict[str, TeleSignalItem] = {}
 telemetries: Dict[str, TelemetryItem] = {}
 tap_changers: Dict[str, TapChangerItem] = {}
 
-# Initialize MODBUS Data Store with sufficient space
-store = ModbusSlaveContext(
-    di=ModbusSequentialDataBlock(0, [0] * 5000),  # Discrete Inputs
-    co=ModbusSequentialDataBlock(0, [0] * 5000),  # Coil Statuses
-    hr=ModbusSequentialDataBlock(0, [0] * 7000),  # Holding Registers
-    ir=ModbusSequentialDataBlock(0, [0] * 7000),  # Input Registers
-)
-context = ModbusServerContext(slaves=store, single=True)
+# Simulated time used by the simulation loop and command timers
+sim_clock = SimulationClock(SIM_CLOCK_MODE, SIM_SPEED, SIM_SEED)
+
+# Event-loop lag measurement with stack samples of stalls
+watchdog = LoopWatchdog(threshold=LOOP_LAG_THRESHOLD_MS / 1000)
+
+# Thread ids sampled by the profiler endpoint, filled in at startup
+profiled_threads: Dict[str, int] = {}
+
+if SIM_ROLE != "worker":
+    # Initialize MODBUS Data Store with sufficient space
+    store = SimulatorSlaveContext(
+        di=ModbusSequentialDataBlock(0, [0] * 5000),  # Discrete Inputs
+        co=ModbusSequentialDataBlock(0, [0] * 5000),  # Coil Statuses
+        hr=ModbusSequentialDataBlock(0, [0] * 7000),  # Holding Registers
+        ir=ModbusSequentialDataBlock(0, [0] * 7000),  # Input Registers
+    )
+    context = ModbusServerContext(slaves=store, single=True)
+
+    # Encoded responses for hot read ranges, dropped on any write to a covered address
+    response_cache = ReadResponseCache(MODBUS_RESPONSE_CACHE_SIZE)
+    store.write_listeners.append(response_cache.invalidate)
+
+    # Binary ring buffer of Modbus transactions, toggled at runtime via /capture
+    capture = TransactionCapture(MODBUS_CAPTURE_SIZE, MODBUS_CAPTURE_ENABLED)
+
+    # Latency/drop/exception/close rules for Modbus requests, managed via /faults
+    faults = FaultInjector(SIM_SEED)
+
+    # Value history of telesignals and telemetries, bounded by HISTORY_SIZE * HISTORY_MAX_POINTS
+    history = HistoryStore(HISTORY_SIZE, HISTORY_MAX_POINTS)
+
+    # Raise/lower state machine for tap changers, driven by Modbus command writes
+    tap_engine = TapChangerEngine(store)
+
+    # Compiled device templates (bay, feeder, transformer and user-defined ones)
+    templates = TemplateLibrary()
+else:
+    # API workers forward commands to the simulation process, which owns all of the above
+    store = context = response_cache = capture = faults = history = tap_engine = templates = None
+
+# Cached, versioned collection snapshots shared by broadcasts and connecting clients
+snapshots = CollectionSnapshots({
+    "circuit_breakers": lambda: circuit_breakers.values(),
+    "telesignals": lambda: telesignals.values(),
+    "telemetries": lambda: telemetries.values(),
+    "tap_changers": lambda: tap_changers.values(),
+}, SNAPSHOT_PAGE_SIZE)
+
+def broadcast(collection: str, room: Optional[str] = None, changed: Optional[List[BaseModel]] = None, removed: Optional[List[str]] = None):
+    """
+    Mark a collection as changed and send it to every client (or to `room`).
+    If the change is known to be limited to the `changed` items and the `removed`
+    ids, API workers only receive those.
+    """
+    snapshots.touch(collection)
+    replicate(collection, room, changed=changed, removed=removed)
+    if outbound.has_recipients(room):
+        outbound.emit(collection, snapshots.event(collection), room=room)
+
+def replicate(collection: str, room: Optional[str] = None, notify: bool = True,
+              changed: Optional[List[BaseModel]] = None, removed: Optional[List[str]] = None):
+    """Send a collection, or only its changes, to the API workers, which pass it on to their clients if `notify`."""
+    if bus_server is None or not bus_server.subscribers:
+        return
+    message = {
+        "type": "collection",
+        "collection": collection,
+        "epoch": snapshots.epoch,
+        "version": snapshots.version(collection),
+        "room": room,
+        "notify": notify,
+    }
+    if changed is None and removed is None:
+        message["items"] = snapshots.items(collection)
+    else:
+        # Workers apply the change to their copy; only the changed items are serialized
+        message["type"] = "delta"
+        message["items"] = [item.model_dump() for item in changed or ()]
+        message["removed"] = removed or []
+    bus_server.publish(message)
+
+def initial_data() -> dict:
+    """Every collection, as sent to clients in response to `get_initial_data`."""
+    data = {name: snapshots.items(name) for name in snapshots.sources}
+    data["epoch"] = snapshots.epoch
+    data["versions"] = {name: snapshots.version(name) for name in snapshots.sources}
+    return data
 
 # Socket.IO event handlers
 @sio.event
 async def connect(sid, environ):
     logger.info(f"Client connected: {sid}")
-    # Send current state to new clients
-    await sio.emit('circuit_breakers', [item.model_dump() for item in circuit_breakers.values()], room=sid)
-    await sio.emit('telesignals', [item.model_dump() for item in telesignals.values()], room=sid)
-    await sio.emit('telemetries', [item.model_dump() for item in telemetries.values()], room=sid)
-    await sio.emit('tap_changers', [item.model_dump() for item in tap_changers.values()], room=sid)
+    outbound.register(sid)
+    # Tell new clients which collection versions exist; they fetch what they are missing
+    outbound.emit('data_manifest', snapshots.manifest(), room=sid)
 
 @sio.event
 async def disconnect(sid):
     logger.info(f"Client disconnected: {sid}")
+    outbound.unregister(sid)
     
 @sio.event
 async def get_initial_data(sid):
     """Send initial data to the frontend."""
     try:
-        data = {
-            "circuit_breakers": [item.model_dump() for item in circuit_breakers.values()],
-            "telesignals": [item.model_dump() for item in telesignals.values()],
-            "telemetries": [item.model_dump() for item in telemetries.values()],
-            "tap_changers": [item.model_dump() for item in tap_changers.values()],
-        }
-        await sio.emit('get_initial_data_response', data, room=sid)
+        outbound.emit('get_initial_data_response', initial_data(), room=sid)
         logger.info(f"Initial data sent to {sid}")
     except Exception as e:
         logger.error(f"Error fetching initial data: {e}")
-        await sio.emit('get_initial_data_error', {"error": "Failed to fetch initial data"}, room=sid)
+        outbound.emit('get_initial_data_error', {"error": "Failed to fetch initial data"}, room=sid)
+
+@sio.event
+async def get_data_manifest(sid, data=None):
+    """Send collection versions and page counts, e.g. after a reconnect."""
+    try:
+        outbound.emit('data_manifest', snapshots.manifest((data or {}).get('page_size')), room=sid)
+    except ValueError as e:
+        outbound.emit('data_page_error', {"error": str(e)}, room=sid)
+
+@sio.event
+async def get_data_page(sid, data):
+    """Send one page of a collection from the cached snapshot."""
+    try:
+        page = snapshots.page(data.get('collection'), int(data.get('page', 1)), data.get('page_size'))
+        outbound.emit('data_page', page, room=sid)
+    except (AttributeError, TypeError, ValueError) as e:
+        outbound.emit('data_page_error', {"error": str(e), "request": data}, room=sid)
     
 @sio.event
 async def add_circuit_breaker(sid, data):
@@ -122,7 +254,7 @@ async def add_circuit_breaker(sid, data):
             store.setValues(1, item.ioa_local_remote_dp - 1, [item.remote_dp])
             
         logger.info(f"Added circuit breaker: {item.name} with IOA CB status open (for unique value): {item.ioa_cb_status}")
-        await sio.emit('circuit_breakers', [item.model_dump() for item in circuit_breakers.values()])
+        broadcast('circuit_breakers', changed=[item])
         return {"status": "success", "message": f"Added circuit breaker {item.name}"}
     except Exception as e:
         logger.error(f"Error adding circuit breaker: {e}")
@@ -187,7 +319,7 @@ async def update_circuit_breaker(sid, data):
                             store.setValues(3, item.ioa_control_dp - 1, [value])   
             
             logger.info(f"Updated circuit breaker: {item.name}, data: {circuit_breakers[item_id].model_dump()}")
-            await sio.emit('circuit_breakers', [item.model_dump() for item in circuit_breakers.values()])
+            broadcast('circuit_breakers', changed=[item])
             return {"status": "success"}
     
     return {"status": "error", "message": "Circuit breaker not found"}
@@ -214,7 +346,7 @@ async def remove_circuit_breaker(sid, data):
             store.setValues(1, item.ioa_local_remote_dp - 1, [False])
         
         logger.info(f"Removed circuit breaker: {item.name}")
-        await sio.emit('circuit_breakers', [item.model_dump() for item in circuit_breakers.values()])
+        broadcast('circuit_breakers', removed=[item_id])
         return {"status": "success", "message": f"Removed circuit breaker {item.name}"}
     return {"status": "error", "message": "Circuit breaker not found"}
 
@@ -225,8 +357,9 @@ async def add_telesignal(sid, data):
     # Update Modbus register with initial state
     try:
         store.setValues(1, item.ioa - 1, [item.value])  # Discrete input
+        history.record('telesignals', item.id, sim_clock.now(), item.value)
         logger.info(f"Added telesignal: {item.name} with IOA {item.ioa}")
-        await sio.emit('telesignals', [item.model_dump() for item in telesignals.values()])
+        broadcast('telesignals', changed=[item])
         return {"status": "success", "message": f"Added telesignal {item.name}"}
     except Exception as e:
         logger.error(f"Error adding telesignal: {e}")
@@ -263,9 +396,10 @@ async def update_telesignal(sid, data):
                     if key == 'value':
                         store.setValues(1, item.ioa - 1, [value])
                         telesignals[item_id].value = value
+                        history.record('telesignals', item_id, sim_clock.now(), value)
             
             logger.info(f"Updated telesignal: {item.name}, data: {telesignals[item_id].model_dump()}")
-            await sio.emit('telesignals', [item.model_dump() for item in telesignals.values()])
+            broadcast('telesignals', changed=[item])
             return {"status": "success"}
     
     return {"status": "error", "message": "Telesignal not found"}
@@ -275,11 +409,12 @@ async def remove_telesignal(sid, data):
     item_id = data.get('id')
     if item_id and item_id in telesignals:
         item = telesignals.pop(item_id)
+        history.discard('telesignals', item_id)
         # Remove Modbus register
         store.setValues(1, item.ioa - 1, [0])  # Reset to 0
         
         logger.info(f"Removed telesignal: {item.name}")
-        await sio.emit('telesignals', [item.model_dump() for item in telesignals.values()])
+        broadcast('telesignals', removed=[item_id])
         return {"status": "success", "message": f"Removed telesignal {item.name}"}
     return {"status": "error", "message": "Telesignal not found"}
 
@@ -292,6 +427,7 @@ async def add_telemetry(sid, data):
         scaled_value = int(item.value / item.scale_factor)
 
         store.setValues(3, item.ioa - 1, [scaled_value])  # Holding register
+        history.record('telemetries', item.id, sim_clock.now(), item.value)
 
         telemetries[item.id].value = item.value
         telemetries[item.id].scale_factor = item.scale_factor
@@ -300,7 +436,7 @@ async def add_telemetry(sid, data):
         telemetries[item.id].max_value = item.max_value
         
         logger.info(f"Added telemetry: {item.name} with IOA {item.ioa}")
-        await sio.emit('telemetries', [item.model_dump() for item in telemetries.values()])
+        broadcast('telemetries', changed=[item])
         return {"status": "success", "message": f"Added telemetry {item.name}"}
     except Exception as e:
         logger.error(f"Error adding telemetry: {e}")
@@ -330,9 +466,13 @@ async def update_telemetry(sid, data):
                     # else:
                     #     value_type = 
                     #     scaled_value = item.value
-                    scaled_value = int(item.value / scale_factor)
+                    scaled_value = int(round(item.value / scale_factor))
                     
                     store.setValues(3, new_ioa - 1, [scaled_value])
+                    # The point's value as the new register holds it; a new value in `data` is recorded below instead
+                    item.value = scaled_value * scale_factor
+                    if 'value' not in data:
+                        history.record('telemetries', item_id, sim_clock.now(), item.value)
                     
                     # update auto_mode and other metadata for new ioa
                     telemetries[item_id].ioa = new_ioa
@@ -352,11 +492,14 @@ async def update_telemetry(sid, data):
                         
                         # Update IEC server for the IOA value
                         if key == 'value':
-                            scaled_value = int(item.value / item.scale_factor)
+                            scaled_value = int(round(item.value / item.scale_factor))
                             store.setValues(3, item.ioa - 1, [scaled_value])
+                            # Keep the value the register holds, so the monitor sees no change and does not record it again
+                            item.value = scaled_value * item.scale_factor
+                            history.record('telemetries', item_id, sim_clock.now(), item.value)
                             
                 logger.info(f"Updated telemetry: {item.name}, data: {telemetries[item_id].model_dump()}")
-                await sio.emit('telemetries', [item.model_dump() for item in telemetries.values()])
+                broadcast('telemetries', changed=[item])
                 return {"status": "success"}
     return {"status": "error", "message": "Telemetry not found"}
         
@@ -365,12 +508,13 @@ async def remove_telemetry(sid, data):
     item_id = data.get('id')
     if item_id and item_id in telemetries:
         item = telemetries.pop(item_id)
+        history.discard('telemetries', item_id)
         
         # Remove Modbus register
         store.setValues(3, item.ioa - 1, [0])  # Reset to 0
         
         logger.info(f"Removed telemetry: {item.name}")
-        await sio.emit('telemetries', [item.model_dump() for item in telemetries.values()])
+        broadcast('telemetries', removed=[item_id])
         return {"status": "success", "message": f"Removed telemetry {item.name}"}
     return {"status": "error", "message": "Telemetry not found"}
 
@@ -383,14 +527,14 @@ async def add_tap_changer(sid, data):
         store.setValues(3, item.ioa_value - 1, [item.value])  # Holding register for value
         store.setValues(3, item.ioa_high_limit - 1, [item.value_high_limit])  # Holding register for high limit
         store.setValues(3, item.ioa_low_limit - 1, [item.value_low_limit])  # Holding register for low limit
-        store.setValues(1, item.ioa_status_raise_lower - 1, [0])  # Discrete input for raise/lower status
+        store.setValues(3, item.ioa_status_raise_lower - 1, [0])  # Holding register for raise/lower status
         store.setValues(1, item.ioa_status_auto_manual - 1, [item.auto_mode])  # Discrete input for auto/manual status
         store.setValues(1, item.ioa_local_remote - 1, [item.is_local_remote])  # Discrete input for local/remote status
-        store.setValues(1, item.ioa_command_raise_lower - 1, [0])  # Coil for raise/lower command
+        store.setValues(3, item.ioa_command_raise_lower - 1, [0])  # Holding register for raise/lower command
         store.setValues(1, item.ioa_command_auto_manual - 1, [item.auto_mode])  # Coil for auto/manual command
         
         logger.info(f"Added tap changer: {item.name} with IOA Value {item.ioa_value}")
-        await sio.emit('tap_changers', [item.model_dump() for item in tap_changers.values()])
+        broadcast('tap_changers', changed=[item])
     except Exception as e:
         logger.error(f"Error adding tap changer: {e}")
         return {"status": "error", "message": "Failed to add tap changer"}    
@@ -403,6 +547,7 @@ async def update_tap_changer(sid, data):
     if id:
         for item_id, item in list(tap_changers.items()):
             if id == item_id:
+                auto_mode = item.auto_mode
                 # Check if IOA is being updated
                 old_ioa_value = item.ioa_value
                 new_ioa_value = data.get('ioa_value')
@@ -433,17 +578,20 @@ async def update_tap_changer(sid, data):
                             store.setValues(3, item.ioa_high_limit - 1, [value])
                         elif key == 'value_low_limit':
                             store.setValues(3, item.ioa_low_limit - 1, [value])
-                        elif key == 'auto_mode':
-                            store.setValues(1, item.ioa_status_auto_manual - 1, [value])
                         elif key == 'status_raise_lower':
-                            store.setValues(1, item.ioa_status_raise_lower - 1, [value])
+                            store.setValues(3, item.ioa_status_raise_lower - 1, [value])
                         elif key == 'status_auto_manual':
                             store.setValues(1, item.ioa_status_auto_manual - 1, [value])
                         elif key == 'is_local_remote':
                             store.setValues(1, item.ioa_local_remote - 1, [value])
+
+                # Keep the auto/manual status coil in step with the mode, whichever field changed it
+                item.auto_mode = bool(item.auto_mode)
+                if item.auto_mode != auto_mode:
+                    tap_engine.write_mode(item)
                         
                 logger.info(f"Updated tap changer: {item.name}, data: {tap_changers[item_id].model_dump()}")
-                await sio.emit('tap_changers', [item.model_dump() for item in tap_changers.values()])
+                broadcast('tap_changers', changed=[item])
                 return {"status": "success"}
             
     return {"status": "error", "message": "Tap changer not found"}
@@ -453,22 +601,122 @@ async def remove_tap_changer(sid, data):
     item_id = data.get('id')
     if item_id and item_id in tap_changers:
         item = tap_changers.pop(item_id)
+        tap_engine.cancel(item_id)
 
         store.setValues(3, item.ioa_value - 1, [0])  # Reset holding register for value
         store.setValues(3, item.ioa_high_limit - 1, [0])  # Reset holding register for high limit
         store.setValues(3, item.ioa_low_limit - 1, [0])  # Reset holding register for low limit
-        store.setValues(1, item.ioa_status_raise_lower - 1, [0])  # Reset discrete input for raise/lower status
+        store.setValues(3, item.ioa_status_raise_lower - 1, [0])  # Reset holding register for raise/lower status
         store.setValues(1, item.ioa_status_auto_manual - 1, [0])  # Reset discrete input for auto/manual status
         store.setValues(1, item.ioa_local_remote - 1, [0])  # Reset discrete input for local/remote status
-        store.setValues(1, item.ioa_command_raise_lower - 1, [0])  # Reset coil for raise/lower command
+        store.setValues(3, item.ioa_command_raise_lower - 1, [0])  # Reset holding register for raise/lower command
         store.setValues(1, item.ioa_command_auto_manual - 1, [0])  # Reset coil for auto/manual command
 
         logger.info(f"Removed tap changer: {item.name}")
-        await sio.emit('tap_changers', [item.model_dump() for item in tap_changers.values()])
+        broadcast('tap_changers', removed=[item_id])
         return {"status": "success", "message": f"Removed tap changer {item.name}"}
     
     return {"status": "error", "message": "Tap changer not found"}
 
+def simulation_tick(current_time: float, last_update_times: Dict[str, Dict[str, float]]):
+    """
+    One simulation step: update auto-mode points that are due, finish tap changer
+    operations and broadcast the collections that changed.
+    """
+    # Items changed by this step, per collection
+    updated: Dict[str, List[BaseModel]] = {
+        "circuit_breakers": [],
+        "telesignals": [],
+        "telemetries": [],
+        "tap_changers": []
+    }
+
+    # Simulate telesignals in auto mode
+    for item_id, item in list(telesignals.items()):
+        # Skip if not due for update yet
+        last_update = last_update_times["telesignals"].get(item_id, 0)
+        if current_time - last_update < item.interval:
+            continue
+
+        # Check if auto mode is enabled
+        if not getattr(item, 'auto_mode', True):  # Default to True for backward compatibility
+            continue
+
+        new_value = sim_clock.random.randint(0, 1)
+        if new_value != item.value:
+            telesignals[item_id].value = new_value
+            store.setValues(1, item.ioa - 1, [new_value])
+            history.record('telesignals', item_id, current_time, new_value)
+
+            logger.info(f"Telesignal auto-updated: {item.name} (IOA: {item.ioa}) value: {telesignals[item_id].value}")
+
+            # Record update time
+            last_update_times["telesignals"][item_id] = current_time
+            updated["telesignals"].append(item)
+
+    # Simulate telemetry in auto mode
+    for item_id, item in list(telemetries.items()):
+        # Skip if not due for update yet
+        last_update = last_update_times["telemetries"].get(item_id, 0)
+        if current_time - last_update < item.interval:
+            continue
+
+        # Check if auto mode is enabled
+        if not getattr(item, 'auto_mode', True):  # Default to True for backward compatibility
+            continue
+
+        # Generate a random value within range that's a multiple of the scale factor
+        scale_factor = item.scale_factor
+        # Determine how many possible steps exist within the range
+        possible_steps = int(round((item.max_value - item.min_value) / scale_factor)) + 1
+        # Choose a random step
+        random_step = sim_clock.random.randint(0, possible_steps - 1)
+        new_value = item.min_value + (random_step * scale_factor)
+        # Determine precision based on scale factor
+        precision = 0 if scale_factor >= 1 else -int(math.floor(math.log10(scale_factor)))
+        # Round to appropriate precision to avoid floating point errors
+        new_value = round(new_value, precision)
+
+        # Update the telemetry object with the new value
+        telemetries[item_id].value = new_value
+        scaled_value = int(round(new_value / scale_factor))
+
+        store.setValues(3, item.ioa - 1, [scaled_value])  # Holding register
+        history.record('telemetries', item_id, current_time, new_value)
+
+        logger.info(f"Telemetry auto-updated: {item.name} (IOA: {item.ioa}) value: {telemetries[item_id].value}")
+
+        # Record update time
+        last_update_times["telemetries"][item_id] = current_time
+        updated["telemetries"].append(item)
+
+    for item_id, item in list(tap_changers.items()):
+        # Check if item should be updated based on interval
+        last_update = last_update_times["tap_changers"].get(item_id, 0)
+        if current_time - last_update >= item.interval and item.auto_mode:
+            # random value betwwen high and low limit
+            new_value = sim_clock.random.randint(item.value_low_limit, item.value_high_limit)
+
+            # Update the tap changer value
+            tap_changers[item_id].value = new_value
+
+            # Update IEC server
+            store.setValues(3, item.ioa_value - 1, [new_value])
+
+            logger.info(f"Tap changer auto-updated: {item.name} (IOA: {item.ioa_value}) value: {new_value}")
+
+            # Record update time
+            last_update_times["tap_changers"][item_id] = current_time
+            updated["tap_changers"].append(item)
+
+    # Finish tap changer operations whose travel time has elapsed
+    updated["tap_changers"].extend(tap_engine.complete_due(tap_changers, current_time))
+
+    # Broadcast updates only if there were changes
+    for collection, items in updated.items():
+        if items:
+            broadcast(collection, changed=items)
+
 async def poll_ioa_values():
     """
     Continuously poll IOA values from the IEC server and send them to frontend clients.
@@ -487,106 +735,121 @@ async def poll_ioa_values():
     
     while True:
         try:
-            current_time = time.time()
-            has_updates = {
-                "circuit_breakers": False,
-                "telesignals": False,
-                "telemetries": False,
-                "tap_changers": False
-            }
-            
-            # Simulate telesignals in auto mode
-            for item_id, item in list(telesignals.items()):
-                # Skip if not due for update yet
-                last_update = last_update_times["telesignals"].get(item_id, 0)
-                if current_time - last_update < item.interval:
-                    continue
-                
-                # Check if auto mode is enabled
-                if not getattr(item, 'auto_mode', True):  # Default to True for backward compatibility
-                    continue
-                    
-                new_value = random.randint(0, 1)
-                if new_value != item.value:
-                    telesignals[item_id].value = new_value
-                    store.setValues(1, item.ioa - 1, [new_value])
-                    
-                    logger.info(f"Telesignal auto-updated: {item.name} (IOA: {item.ioa}) value: {telesignals[item_id].value}")
-                    
-                    # Record update time
-                    last_update_times["telesignals"][item_id] = current_time
-                    has_updates["telesignals"] = True
-            
-            # Simulate telemetry in auto mode
-            for item_id, item in list(telemetries.items()):
-                # Skip if not due for update yet
-                last_update = last_update_times["telemetries"].get(item_id, 0)
-                if current_time - last_update < item.interval:
-                    continue
-                    
-                # Check if auto mode is enabled
-                if not getattr(item, 'auto_mode', True):  # Default to True for backward compatibility
-                    continue
-                    
-                # Generate a random value within range that's a multiple of the scale factor
-                scale_factor = item.scale_factor
-                # Determine how many possible steps exist within the range
-                possible_steps = int(round((item.max_value - item.min_value) / scale_factor)) + 1
-                # Choose a random step
-                random_step = random.randint(0, possible_steps - 1)
-                new_value = item.min_value + (random_step * scale_factor)
-                # Determine precision based on scale factor
-                precision = 0 if scale_factor >= 1 else -int(math.floor(math.log10(scale_factor)))
-                # Round to appropriate precision to avoid floating point errors
-                new_value = round(new_value, precision)
-                
-                # Update the telemetry object with the new value
-                telemetries[item_id].value = new_value
-                scaled_value = int(round(new_value / scale_factor))
-                
-                store.setValues(3, item.ioa - 1, [scaled_value])  # Holding register
-                
-                logger.info(f"Telemetry auto-updated: {item.name} (IOA: {item.ioa}) value: {telemetries[item_id].value}")
-                
-                # Record update time
-                last_update_times["telemetries"][item_id] = current_time
-                has_updates["telemetries"] = True
-                
-            for item_id, item in list(circuit_breakers.items()):
-                 # Check if item should be updated based on interval
-                last_update = last_update_times["tap_changers"].get(item_id, 0)
-                if current_time - last_update >= item.interval and item.auto_mode:
-                    # random value betwwen high and low limit
-                    new_value = random.randint(item.value_low_limit, item.value_high_limit)
-                    
-                    # Update the tap changer value
-                    tap_changers[item_id].value = new_value
-                    
-                    # Update IEC server
-                    store.setValues(3, item.ioa_value - 1, [new_value])
-                    
-                    logger.info(f"Tap changer auto-updated: {item.name} (IOA: {item.ioa_value}) value: {new_value}")
-                    
-                    # Record update time
-                    last_update_times["tap_changers"][item_id] = current_time
-                    has_updates["tap_changers"] = True    
-                
-            # Broadcast updates only if there were changes
-            if has_updates["circuit_breakers"] and circuit_breakers:
-                await sio.emit('circuit_breakers', [item.model_dump() for item in circuit_breakers.values()])
-            if has_updates["telesignals"] and telesignals:
-                await sio.emit('telesignals', [item.model_dump() for item in telesignals.values()])
-            if has_updates["telemetries"] and telemetries:
-                await sio.emit('telemetries', [item.model_dump() for item in telemetries.values()])
-            if has_updates["tap_changers"] and tap_changers:
-                await sio.emit('tap_changers', [item.model_dump() for item in tap_changers.values()])
-                
+            simulation_tick(sim_clock.now(), last_update_times)
+
             # Use a shorter sleep time to check more frequently, but not burn CPU
-            await asyncio.sleep(0.1)
+            await sim_clock.sleep(0.1)
         except Exception as e:
             logger.error(f"Error in IOA polling task: {str(e)}")
             await asyncio.sleep(3)  # Wait before retrying if there's an error
             
+def register_snapshot() -> Dict[int, list]:
+    """Copy of every register table, keyed by function code, for change detection."""
+    return {
+        2: list(store.getValues(2, 0, 5000)),
+        1: list(store.getValues(1, 0, 5000)),
+        3: list(store.getValues(3, 0, 7000)),
+        4: list(store.getValues(4, 0, 7000)),
+    }
+
+def scan_modbus_changes(prev: Dict[int, list]) -> bool:
+    """
+    Compare the register tables with the `prev` snapshot, apply any changes to
+    the items and broadcast the items that changed. `prev` is updated in place.
+    """
+    changed = False
+    # Items whose fields changed, per collection, by id
+    updated: Dict[str, Dict[str, BaseModel]] = {
+        "circuit_breakers": {},
+        "telesignals": {},
+        "telemetries": {},
+        "tap_changers": {}
+    }
+
+    def assign(collection: str, item: BaseModel, field: str, value):
+        if getattr(item, field) != value:
+            setattr(item, field, value)
+            updated[collection][item.id] = item
+
+    # Read current values
+    cur_di = list(store.getValues(2, 0, 5000))
+    cur_co = list(store.getValues(1, 0, 5000))
+    cur_hr = list(store.getValues(3, 0, 7000))
+    cur_ir = list(store.getValues(4, 0, 7000))
+    prev_di, prev_co, prev_hr, prev_ir = prev[2], prev[1], prev[3], prev[4]
+
+    # Check for changes in Discrete Inputs (2)
+    if cur_di != prev_di:
+        changed = True
+        prev[2] = cur_di
+        # Update circuit breakers as needed
+        for item in circuit_breakers.values():
+            if item.ioa_cb_status - 1 < len(cur_di):
+                assign("circuit_breakers", item, "cb_status_open", cur_di[item.ioa_cb_status - 1])
+            if item.ioa_cb_status_close - 1 < len(cur_di):
+                assign("circuit_breakers", item, "cb_status_close", cur_di[item.ioa_cb_status_close - 1])
+
+    # Check for changes in Coils (1)
+    if cur_co != prev_co:
+        changed = True
+        for item in tap_changers.values():
+            index = item.ioa_command_auto_manual - 1
+            if index < len(cur_co) and cur_co[index] != prev_co[index]:
+                if tap_engine.handle_auto_manual(item, cur_co[index]):
+                    updated["tap_changers"][item.id] = item
+        prev[1] = cur_co
+        # Telesignals are stored in the coil table, where masters can also write them
+        now = sim_clock.now()
+        for item in telesignals.values():
+            if item.ioa - 1 < len(cur_co):
+                new_val = int(cur_co[item.ioa - 1])
+                if item.value != new_val:
+                    assign("telesignals", item, "value", new_val)
+                    history.record('telesignals', item.id, now, new_val)
+        for item in circuit_breakers.values():
+            if item.ioa_control_open - 1 < len(cur_co):
+                assign("circuit_breakers", item, "control_open", cur_co[item.ioa_control_open - 1])
+            if item.ioa_control_close - 1 < len(cur_co):
+                assign("circuit_breakers", item, "control_close", cur_co[item.ioa_control_close - 1])
+            if item.ioa_local_remote_sp - 1 < len(cur_co):
+                assign("circuit_breakers", item, "remote_sp", cur_co[item.ioa_local_remote_sp - 1])
+
+    # Check for changes in Holding Registers (3)
+    if cur_hr != prev_hr:
+        changed = True
+        prev[3] = cur_hr
+        now = sim_clock.now()
+        for item in telemetries.values():
+            if item.ioa - 1 < len(cur_hr):
+                # Convert back to float using scale_factor
+                new_val = cur_hr[item.ioa - 1] * item.scale_factor
+                if not math.isclose(item.value, new_val):
+                    assign("telemetries", item, "value", new_val)
+                    history.record('telemetries', item.id, now, new_val)
+        for item in circuit_breakers.values():
+            if item.ioa_control_dp and item.ioa_control_dp - 1 < len(cur_hr):
+                assign("circuit_breakers", item, "control_dp", cur_hr[item.ioa_control_dp - 1])
+        for item in tap_changers.values():
+            if item.ioa_command_raise_lower - 1 < len(cur_hr):
+                status = item.status_raise_lower
+                tap_engine.handle_raise_lower(item, cur_hr[item.ioa_command_raise_lower - 1], now)
+                if item.status_raise_lower != status:
+                    updated["tap_changers"][item.id] = item
+
+    # Check for changes in Input Registers (4)
+    if cur_ir != prev_ir:
+        changed = True
+        prev[4] = cur_ir
+        for item in circuit_breakers.values():
+            if item.ioa_cb_status_dp and item.ioa_cb_status_dp - 1 < len(cur_ir):
+                assign("circuit_breakers", item, "cb_status_dp", cur_ir[item.ioa_cb_status_dp - 1])
+
+    # Emit only the collections, and to API workers only the items, that changed
+    for collection, items in updated.items():
+        if items:
+            broadcast(collection, changed=list(items.values()))
+    return changed
+
 async def monitor_modbus_changes():
     """
     Poll Modbus registers, coils, and inputs every 1 ms.
@@ -594,75 +857,11 @@ async def monitor_modbus_changes():
     """
     logger.info("Starting Modbus register monitoring task")
     # Take initial snapshots
-    prev_di = list(store.getValues(2, 0, 5000))
-    prev_co = list(store.getValues(1, 0, 5000))
-    prev_hr = list(store.getValues(3, 0, 7000))
-    prev_ir = list(store.getValues(4, 0, 7000))
+    prev = register_snapshot()
 
     while True:
         try:
-            changed = False
-
-            # Read current values
-            cur_di = list(store.getValues(2, 0, 5000))
-            cur_co = list(store.getValues(1, 0, 5000))
-            cur_hr = list(store.getValues(3, 0, 7000))
-            cur_ir = list(store.getValues(4, 0, 7000))
-
-            # Check for changes in Discrete Inputs (2)
-            if cur_di != prev_di:
-                changed = True
-                prev_di = cur_di.copy()
-                # Update telesignals/circuit breakers as needed
-                for item in telesignals.values():
-                    new_val = cur_di[item.ioa - 1]
-                    if item.value != new_val:
-                        item.value = new_val
-                for item in circuit_breakers.values():
-                    if item.ioa_cb_status - 1 < len(cur_di):
-                        item.cb_status_open = cur_di[item.ioa_cb_status - 1]
-                    if item.ioa_cb_status_close - 1 < len(cur_di):
-                        item.cb_status_close = cur_di[item.ioa_cb_status_close - 1]
-
-            # Check for changes in Coils (1)
-            if cur_co != prev_co:
-                changed = True
-                prev_co = cur_co.copy()
-                for item in circuit_breakers.values():
-                    if item.ioa_control_open - 1 < len(cur_co):
-                        item.control_open = cur_co[item.ioa_control_open - 1]
-                    if item.ioa_control_close - 1 < len(cur_co):
-                        item.control_close = cur_co[item.ioa_control_close - 1]
-                    if item.ioa_local_remote - 1 < len(cur_co):
-                        item.remote = cur_co[item.ioa_local_remote - 1]
-
-            # Check for changes in Holding Registers (3)
-            if cur_hr != prev_hr:
-                changed = True
-                prev_hr = cur_hr.copy()
-                for item in telemetries.values():
-                    if item.ioa - 1 < len(cur_hr):
-                        # Convert back to float using scale_factor
-                        item.value = cur_hr[item.ioa - 1] * item.scale_factor
-                for item in circuit_breakers.values():
-                    if item.ioa_control_dp and item.ioa_control_dp - 1 < len(cur_hr):
-                        item.control_dp = cur_hr[item.ioa_control_dp - 1]
-
-            # Check for changes in Input Registers (4)
-            if cur_ir != prev_ir:
-                changed = True
-                prev_ir = cur_ir.copy()
-                for item in circuit_breakers.values():
-                    if item.ioa_cb_status_dp and item.ioa_cb_status_dp - 1 < len(cur_ir):
-                        item.cb_status_dp = cur_ir[item.ioa_cb_status_dp - 1]
-
-            # Emit updates if any changes detected
-            if changed:
-                await sio.emit('circuit_breakers', [item.model_dump() for item in circuit_breakers.values()])
-                await sio.emit('telesignals', [item.model_dump() for item in telesignals.values()])
-                await sio.emit('telemetries', [item.model_dump() for item in telemetries.values()])
-                await sio.emit('tap_changers', [item.model_dump() for item in tap_changers.values()])
-
+            scan_modbus_changes(prev)
             await asyncio.sleep(0.001)  # 1 ms
         except Exception as e:
             logger.error(f"Error in Modbus monitoring task: {str(e)}")
@@ -690,10 +889,10 @@ async def export_data(sid):
             "telemetries": [item.model_dump() for item in telemetries.values()],
             "tap_changers": [item.model_dump() for item in tap_changers.values()],
         }
-        await sio.emit('export_data_response', data, room=sid)
+        outbound.emit('export_data_response', data, room=sid)
     except Exception as e:
         logger.error(f"Error exporting data: {e}")
-        await sio.emit('export_data_error', {"error": "Failed to export data"}, room=sid)
+        outbound.emit('export_data_error', {"error": "Failed to export data"}, room=sid)
 
 @sio.event
 async def import_data(sid, data):
@@ -705,6 +904,8 @@ async def import_data(sid, data):
         telesignals.clear()
         telemetries.clear()
         tap_changers.clear()
+        tap_engine.clear()
+        history.clear()
 
         # Populate with new data
         for cb in data.get("circuit_breakers", []):
@@ -737,6 +938,7 @@ async def import_data(sid, data):
             
             # Update Modbus register with initial state
             store.setValues(1, item.ioa - 1, [item.value])  # Discrete input
+            history.record('telesignals', item.id, sim_clock.now(), item.value)
             logger.info(f"Added telesignal: {item.name} with IOA {item.ioa}")
 
         for tm in data.get("telemetries", []):
@@ -747,6 +949,7 @@ async def import_data(sid, data):
             scaled_value = int(item.value / item.scale_factor)
             
             store.setValues(3, item.ioa - 1, [scaled_value])  # Holding register
+            history.record('telemetries', item.id, sim_clock.now(), item.value)
             logger.info(f"Added telemetry: {item.name} with IOA {item.ioa}")
             
         for tc in data.get("tap_changers", []):
@@ -756,22 +959,22 @@ async def import_data(sid, data):
             store.setValues(3, item.ioa_value - 1, [item.value])  # Holding register for value
             store.setValues(3, item.ioa_high_limit - 1, [item.value_high_limit])  # Holding register for high limit
             store.setValues(3, item.ioa_low_limit - 1, [item.value_low_limit])  # Holding register for low limit
-            store.setValues(1, item.ioa_status_raise_lower - 1, [0])  # Discrete input for raise/lower status
+            store.setValues(3, item.ioa_status_raise_lower - 1, [0])  # Holding register for raise/lower status
             store.setValues(1, item.ioa_status_auto_manual - 1, [item.auto_mode])  # Discrete input for auto/manual status
             store.setValues(1, item.ioa_local_remote - 1, [item.is_local_remote])  # Discrete input for local/remote status
-            store.setValues(1, item.ioa_command_raise_lower - 1, [0])  # Coil for raise/lower command
+            store.setValues(3, item.ioa_command_raise_lower - 1, [0])  # Holding register for raise/lower command
             store.setValues(1, item.ioa_command_auto_manual - 1, [item.auto_mode])  # Coil for auto/manual command 
             
             logger.info(f"Added tap changer: {item.name} with IOA Value {item.ioa_value}")
             
-        await sio.emit('circuit_breakers', [item.model_dump() for item in circuit_breakers.values()], room=sid)
-        await sio.emit('telesignals', [item.model_dump() for item in telesignals.values()], room=sid)
-        await sio.emit('telemetries', [item.model_dump() for item in telemetries.values()], room=sid)
-        await sio.emit('tap_changers', [item.model_dump() for item in tap_changers.values()], room=sid)
-        await sio.emit('import_data_response', {"status": "success"}, room=sid)
+        broadcast('circuit_breakers', room=sid)
+        broadcast('telesignals', room=sid)
+        broadcast('telemetries', room=sid)
+        broadcast('tap_changers', room=sid)
+        outbound.emit('import_data_response', {"status": "success"}, room=sid)
     except Exception as e:
         logger.error(f"Error importing data: {e}")
-        await sio.emit('import_data_error', {"error": "Failed to import data"}, room=sid)
+        outbound.emit('import_data_error', {"error": "Failed to import data"}, room=sid)
             
 @sio.event
 async def update_order(sid, data):
@@ -813,6 +1016,10 @@ async def update_order(sid, data):
             if id in tap_changers:
                 ordered_items[id] = tap_changers[id]
         tap_changers = ordered_items
+
+    if item_type in snapshots.sources:
+        snapshots.touch(item_type)
+        replicate(item_type, notify=False)
         
 device = ModbusDeviceIdentification(
         info_name={
@@ -826,54 +1033,480 @@ device = ModbusDeviceIdentification(
     )
 
 # Start the MODBUS server
-def run_modbus_server():
-    StartTcpServer(
-        context=context, 
+async def serve_modbus():
+    server = SimulatorTcpServer(
+        context,
+        response_cache=response_cache,
+        capture=capture,
+        faults=faults,
         address=(MODBUS_HOST, MODBUS_PORT),
         framer=FramerType.SOCKET,
         identity=device,
     )
+    await server.serve_forever()
+
+def run_modbus_server():
+    asyncio.run(serve_modbus())
+
+# Events that change simulator state; API workers run them in the simulation process
+FORWARDED_EVENTS = [
+    'add_circuit_breaker', 'update_circuit_breaker', 'remove_circuit_breaker',
+    'add_telesignal', 'update_telesignal', 'remove_telesignal',
+    'add_telemetry', 'update_telemetry', 'remove_telemetry',
+    'add_tap_changer', 'update_tap_changer', 'remove_tap_changer',
+    'import_data', 'export_data', 'update_order',
+]
+
+async def bus_sync(params: dict) -> dict:
+    """Every collection snapshot, for an API worker that (re)connected."""
+    return {
+        "epoch": snapshots.epoch,
+        "collections": {
+            name: {"version": snapshots.version(name), "items": snapshots.items(name)}
+            for name in snapshots.sources
+        },
+    }
+
+async def bus_event(params: dict):
+    """Run a Socket.IO event on behalf of a client connected to an API worker."""
+    event = params.get("event")
+    if event not in FORWARDED_EVENTS:
+        raise ValueError(f"Event '{event}' cannot be forwarded")
+    return await sio.handlers['/'][event](params.get("sid"), *params.get("args", []))
+
+def relay_emit(event: str, data, room: str):
+    bus_server.publish({"type": "emit", "event": event, "data": data, "room": room})
+
+def install_replica(collection: str, items: List[dict], version: int):
+    replicas[collection] = {item["id"]: item for item in items}
+    snapshots.replace(collection, items, version)
+
+def apply_delta(message: dict) -> bool:
+    """Apply changed and removed items to this API worker's copy of a collection. Returns False if it is out of step."""
+    collection = message["collection"]
+    if message["epoch"] != snapshots.epoch or message["version"] <= snapshots.version(collection):
+        return True  # not synchronized yet, or already part of the last sync
+    if message["version"] != snapshots.version(collection) + 1:
+        return False
+    replica = replicas[collection]
+    for item in message["items"]:
+        replica[item["id"]] = item
+    for item_id in message["removed"]:
+        replica.pop(item_id, None)
+    snapshots.replace(collection, list(replica.values()), message["version"])
+    return True
+
+def handle_bus_message(message: dict):
+    """Apply a message published by the simulation process to this API worker."""
+    if message.get("type") in ("collection", "delta"):
+        if sync_buffer is not None:
+            # Applied once the snapshot being synchronized is installed
+            sync_buffer.append(message)
+            return
+        collection = message["collection"]
+        if message["type"] == "collection":
+            if message["epoch"] == snapshots.epoch and message["version"] <= snapshots.version(collection):
+                return  # already part of the last sync
+            snapshots.epoch = message["epoch"]
+            install_replica(collection, message["items"], message["version"])
+        elif not apply_delta(message):
+            logger.warning(f"Missed a change of {collection} from the simulation process, synchronizing again")
+            request_resync()
+            return
+        if message["notify"] and outbound.has_recipients(message["room"]):
+            outbound.emit(collection, snapshots.event(collection), room=message["room"])
+    elif message.get("type") == "emit":
+        outbound.emit(message["event"], message["data"], room=message["room"])
+
+def request_resync():
+    global resync_task
+    if resync_task is None or resync_task.done():
+        resync_task = asyncio.create_task(sync_from_simulator())
+
+async def sync_from_simulator():
+    global sync_buffer
+    # Changes published while the request is in flight may be newer than the reply
+    buffered = sync_buffer = []
+    try:
+        state = await bus_client.request("sync")
+    finally:
+        sync_buffer = None
+    snapshots.epoch = state["epoch"]
+    for name, snapshot in state["collections"].items():
+        install_replica(name, snapshot["items"], snapshot["version"])
+    replayed = 0
+    for message in buffered:
+        if message["epoch"] != snapshots.epoch or message["version"] > snapshots.version(message["collection"]):
+            replayed += 1
+        handle_bus_message(message)
+    # Clients that connected in the meantime fetch whatever changed
+    outbound.emit('data_manifest', snapshots.manifest())
+    logger.info(f"Synchronized {sum(len(snapshot['items']) for snapshot in state['collections'].values())} items "
+                f"from the simulation process, {replayed} later changes replayed")
+
+def forward_event(event: str):
+    async def forward(sid, *args):
+        try:
+            return await bus_client.request("event", {"event": event, "sid": sid, "args": list(args)})
+        except (ConnectionError, RuntimeError, asyncio.TimeoutError) as e:
+            logger.error(f"Error forwarding {event} to the simulation process: {e}")
+            return {"status": "error", "message": str(e)}
+    return forward
+
+# Message bus between the simulation process and the API workers
+bus_server = BusServer(SIM_BUS_PATH, {"sync": bus_sync, "event": bus_event}) if SIM_ROLE == "simulator" else None
+bus_client = BusClient(SIM_BUS_PATH, handle_bus_message, sync_from_simulator) if SIM_ROLE == "worker" else None
+
+# API workers: copy of the simulation process's collections by item id, kept current with deltas
+replicas: Dict[str, Dict[str, dict]] = {name: {} for name in snapshots.sources}
+resync_task: Optional[asyncio.Task] = None
+# Collection messages received while a sync request is in flight
+sync_buffer: Optional[List[dict]] = None
+
+if SIM_ROLE == "worker":
+    for event in FORWARDED_EVENTS:
+        sio.on(event, forward_event(event))
 
 # Lifespan event handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup code
-    # Start Modbus server using threading instead of asyncio
-    server_thread = threading.Thread(target=run_modbus_server, daemon=True)
-    server_thread.start()
-    logger.info(f"Started MODBUS TCP Server on {MODBUS_HOST}:{MODBUS_PORT}")
+    profiled_threads["event-loop"] = threading.get_ident()
+    tasks = [asyncio.create_task(watchdog.run())]
+
+    if SIM_ROLE == "worker":
+        # State, simulation and Modbus live in the simulation process
+        tasks.append(asyncio.create_task(bus_client.run()))
+        logger.info(f"Started API worker using the message bus at {SIM_BUS_PATH}")
+    else:
+        # Start Modbus server using threading instead of asyncio
+        server_thread = threading.Thread(target=run_modbus_server, daemon=True, name="modbus-server")
+        server_thread.start()
+        logger.info(f"Started MODBUS TCP Server on {MODBUS_HOST}:{MODBUS_PORT}")
+        profiled_threads["modbus-server"] = server_thread.ident
 
-    # Start the Socket.IO update task
-    poll_task = asyncio.create_task(poll_ioa_values())
-    monitor_task = asyncio.create_task(monitor_modbus_changes())
-    logger.info("Started Socket.IO simulation task and MODBUS register monitoring task")
+        # Start the Socket.IO update task
+        tasks.append(asyncio.create_task(poll_ioa_values()))
+        tasks.append(asyncio.create_task(monitor_modbus_changes()))
+        logger.info("Started Socket.IO simulation task and MODBUS register monitoring task")
+
+    if bus_server is not None:
+        await bus_server.start()
+        outbound.relay = relay_emit
 
     try:
         yield
     finally:
         # Shutdown code
-        ServerStop()
-        poll_task.cancel()
-        monitor_task.cancel()
+        if SIM_ROLE != "worker":
+            ServerStop()
+        for task in tasks:
+            task.cancel()
+        if bus_server is not None:
+            await bus_server.close()
         logger.info("Shutting down Socket.IO simulation task")
 
 # Assign lifespan handler to app
 app = FastAPI(lifespan=lifespan)
 socket_app = socketio.ASGIApp(sio, app)
 
+# Endpoints an API worker serves itself; everything else is state of the simulation process
+WORKER_ENDPOINTS = {"/", "/snapshots", "/bus", "/clients/outbound", "/debug/loop", "/debug/profile"}
+
+if SIM_ROLE == "worker":
+    @app.middleware("http")
+    async def simulator_endpoints(request: Request, call_next):
+        if request.url.path not in WORKER_ENDPOINTS:
+            return JSONResponse(status_code=404, content={
+                "detail": f"{request.url.path} is served by the simulation process on port {SIMULATOR_API_PORT}"
+            })
+        return await call_next(request)
+
 # API endpoint home
 @app.get("/")
 async def root():
     return {
         "message": "Modbus TCP Server Simulator API", 
         "status": "running",
-        "items": {
-            "circuit_breakers": len(circuit_breakers),
-            "telesignals": len(telesignals),
-            "telemetries": len(telemetries),
-            "tap_changers": len(tap_changers)
-        }
+        # From the snapshots, which API workers replicate from the simulation process
+        "items": {name: snapshots.total(name) for name in snapshots.sources}
     }
 
+@app.get("/registers/{table}")
+async def read_registers(table: str, start: int = 1, count: int = 1, format: str = "json"):
+    """Read a range of IOAs from one register table as JSON or raw Modbus encoding."""
+    try:
+        fc = resolve_table(table)
+        check_range(store, fc, start, count)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    values = [int(value) for value in store.getValues(fc, start - 1, count)]
+    if format == "binary":
+        return Response(content=pack_values(fc, values), media_type="application/octet-stream")
+    return {"table": table, "start": start, "count": count, "values": values}
+
+@app.post("/registers")
+async def write_registers(batch: RegisterWriteBatch):
+    """
+    Apply several range writes atomically. Items pick up the new values through
+    the regular Modbus change monitoring, exactly as if a master had written them.
+    """
+    writes = []
+    try:
+        for write in batch.writes:
+            fc = resolve_table(write.table)
+            check_range(store, fc, write.start, len(write.values))
+            check_values(fc, write.values)
+            writes.append((fc, write.start - 1, list(write.values)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    store.setValuesBatch(writes)
+    logger.info(f"Applied {len(writes)} register writes ({sum(len(w[2]) for w in writes)} points) via HTTP")
+    return {"status": "success", "ranges": len(writes), "points": sum(len(w[2]) for w in writes)}
+
+@app.get("/clock")
+async def get_clock():
+    return sim_clock.status()
+
+@app.post("/clock")
+async def set_clock(settings: ClockSettings):
+    """Change the simulation clock mode/speed, or reseed the simulation, at runtime."""
+    try:
+        sim_clock.configure(settings.mode, settings.speed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if "seed" in settings.model_fields_set:
+        sim_clock.reseed(settings.seed)
+        faults.random.seed(settings.seed)
+    logger.info(f"Simulation clock set to {sim_clock.mode} at {sim_clock.speed}x")
+    return sim_clock.status()
+
+@app.get("/clients/outbound")
+async def outbound_stats():
+    return outbound.stats()
+
+@app.get("/history")
+async def get_history(points: str, start: Optional[float] = None, end: Optional[float] = None, max_points: int = 500):
+    """
+    Value history for many points at once. `points` is a comma-separated list of
+    `collection:id` (e.g. `telemetries:1747884050882`). `start`/`end` are simulated
+    epoch seconds and default to the whole buffer of each point; windows longer than
+    `max_points` samples are downsampled to last/min/max per time bucket.
+    """
+    keys = []
+    for point in points.split(','):
+        collection, _, item_id = point.strip().partition(':')
+        if collection not in ('telesignals', 'telemetries') or not item_id:
+            raise HTTPException(status_code=400, detail=f"Invalid point '{point}', expected telesignals:<id> or telemetries:<id>")
+        keys.append((collection, item_id))
+    if max_points < 1:
+        raise HTTPException(status_code=400, detail="max_points must be at least 1")
+
+    return {"start": start, "end": end, "points": history.query(keys, start, end, max_points)}
+
+@app.get("/history/stats")
+async def history_stats():
+    return history.stats()
+
+def parse_int_list(value: Optional[str]) -> Optional[set]:
+    return {int(part) for part in value.split(',') if part.strip()} if value else None
+
+@app.get("/capture")
+async def capture_status():
+    return capture.status()
+
+@app.post("/capture")
+async def configure_capture(settings: CaptureSettings):
+    """Start/stop the Modbus transaction capture, resize or clear it, and change its filter."""
+    if settings.capacity is not None and settings.capacity < 1:
+        raise HTTPException(status_code=400, detail="capacity must be at least 1")
+    # Only the filter fields present in the request change; an explicit null removes that criterion
+    criteria = capture.filter.describe()
+    criteria.update(settings.model_dump(include=settings.model_fields_set & criteria.keys()))
+    try:
+        capture.filter = CaptureFilter(
+            set(criteria["units"]) if criteria["units"] is not None else None,
+            set(criteria["function_codes"]) if criteria["function_codes"] is not None else None,
+            criteria["client"],
+            criteria["address_from"],
+            criteria["address_to"],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if settings.capacity is not None and settings.capacity != capture.capacity:
+        capture.resize(settings.capacity)
+    elif settings.clear:
+        capture.clear()
+    if settings.enabled is not None:
+        capture.enabled = settings.enabled
+    logger.info(f"Modbus capture {'enabled' if capture.enabled else 'disabled'}, filter: {capture.filter.describe()}")
+    return capture.status()
+
+@app.get("/capture/export")
+async def export_capture(format: str = "binary", units: Optional[str] = None, function_codes: Optional[str] = None,
+                         client: Optional[str] = None, address_from: Optional[int] = None, address_to: Optional[int] = None):
+    """Download the captured transactions, optionally filtered, as a binary or CSV file."""
+    try:
+        criteria = CaptureFilter(parse_int_list(units), parse_int_list(function_codes), client, address_from, address_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not any(value is not None for value in (units, function_codes, client, address_from, address_to)):
+        criteria = None
+
+    if format == "csv":
+        content, media_type, extension = capture.export_csv(criteria), "text/csv", "csv"
+    else:
+        content, media_type, extension = capture.export_binary(criteria), "application/octet-stream", "bin"
+    filename = f"modbus_capture_{int(time.time())}.{extension}"
+    return Response(content=content, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.get("/faults")
+async def get_faults():
+    return faults.status()
+
+@app.post("/faults")
+async def add_fault(rule: FaultRule):
+    """Add a fault injection rule, or replace the rule with the same id."""
+    try:
+        rule = faults.add_rule(rule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Fault rule set: {rule.model_dump()}")
+    return rule.model_dump()
+
+@app.put("/faults")
+async def replace_faults(rules: List[FaultRule]):
+    """Replace all fault injection rules at once."""
+    try:
+        faults.replace_rules(rules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Fault rules replaced: {len(rules)} rules")
+    return faults.status()
+
+@app.delete("/faults/{rule_id}")
+async def remove_fault(rule_id: str):
+    if not faults.remove_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Fault rule not found")
+    return {"status": "success"}
+
+@app.delete("/faults")
+async def clear_faults():
+    faults.replace_rules([])
+    return {"status": "success"}
+
+@app.get("/debug/loop")
+async def loop_stats():
+    """Event-loop lag statistics and the stack samples taken during recent stalls."""
+    return watchdog.stats()
+
+@app.get("/debug/profile")
+async def profile(seconds: float = 5, interval_ms: float = 5):
+    """
+    Sample the event loop and Modbus server threads for `seconds` and return the
+    stacks in collapsed format, ready for flamegraph.pl or speedscope.
+    """
+    if not 0 < seconds <= 60 or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 60] and interval_ms in [1, 1000]")
+    # Sample from a worker thread so the loop keeps running normally while it is profiled
+    collapsed = await asyncio.to_thread(sample_profile, dict(profiled_threads), seconds, interval_ms / 1000)
+    return Response(content=collapsed, media_type="text/plain")
+
+@app.get("/snapshots")
+async def snapshot_stats():
+    return snapshots.stats()
+
+@app.get("/templates")
+async def list_templates():
+    return templates.describe()
+
+@app.put("/templates/{name}")
+async def define_template(name: str, template: DeviceTemplate):
+    template.name = name
+    try:
+        return templates.define(template).describe()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/templates/{name}")
+async def remove_template(name: str):
+    if not templates.remove(name):
+        raise HTTPException(status_code=404, detail=f"Template '{name}' not found")
+    return {"status": "success"}
+
+@app.post("/templates/{name}/instances")
+async def instantiate_template(name: str, request: TemplateInstantiation):
+    """Stamp out `count` copies of a template with one register batch and one broadcast per collection."""
+    start = time.perf_counter()
+    try:
+        occupied = occupied_addresses(itertools.chain(circuit_breakers.values(), telesignals.values(),
+                                                      telemetries.values(), tap_changers.values()))
+        items, writes = templates.get(name).instantiate(request, store.size, occupied)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Template '{name}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    collections = {
+        "circuit_breakers": circuit_breakers,
+        "telesignals": telesignals,
+        "telemetries": telemetries,
+        "tap_changers": tap_changers,
+    }
+    for collection, new_items in items.items():
+        existing = collections[collection]
+        duplicates = [item.id for item in new_items if item.id in existing]
+        if duplicates:
+            raise HTTPException(status_code=400, detail=f"Items already exist: {', '.join(duplicates[:5])}")
+
+    # History rings are allocated on the first change rather than for every new point
+    store.setValuesBatch(writes)
+    for collection, new_items in items.items():
+        collections[collection].update((item.id, item) for item in new_items)
+        broadcast(collection, changed=new_items)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(f"Instantiated {request.count} x {name} (unit {request.unit_id}) in {elapsed_ms:.1f} ms")
+    return {
+        "template": name,
+        "count": request.count,
+        "unit_id": request.unit_id,
+        "items": {collection: len(new_items) for collection, new_items in items.items()},
+        "writes": len(writes),
+        "elapsed_ms": round(elapsed_ms, 3),
+    }
+
+@app.get("/bus")
+async def bus_stats():
+    if bus_server is not None:
+        return bus_server.stats()
+    if bus_client is not None:
+        return bus_client.stats()
+    return {"role": SIM_ROLE}
+
+@app.get("/modbus/cache")
+async def modbus_cache_stats():
+    return response_cache.stats()
+
+def run_cluster():
+    """
+    Run the simulation process (API on SIMULATOR_API_PORT) and API_WORKERS
+    Socket.IO/HTTP workers sharing FASTAPI_PORT.
+    """
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, SIM_ROLE="simulator", FASTAPI_PORT=str(SIMULATOR_API_PORT), API_WORKERS="1")
+    simulator = subprocess.Popen([sys.executable, os.path.join(backend_dir, "main.py")], env=env)
+    os.environ["SIM_ROLE"] = "worker"
+    try:
+        uvicorn.run("main:socket_app", host=FASTAPI_HOST, port=FASTAPI_PORT, workers=API_WORKERS, app_dir=backend_dir)
+    finally:
+        simulator.terminate()
+        simulator.wait()
+
 if __name__ == "__main__":
-    uvicorn.run(socket_app, host=FASTAPI_HOST, port=FASTAPI_PORT)
\ No newline at end of file
+    if SIM_ROLE == "standalone" and API_WORKERS > 1:
+        run_cluster()
+    else:
+        uvicorn.run(socket_app, host=FASTAPI_HOST, port=FASTAPI_PORT)
\ No newline at end of file
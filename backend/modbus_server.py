@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+import traceback
+from typing import Optional, Tuple
+from pymodbus.exceptions import NoSuchSlaveException
+from pymodbus.pdu import ModbusPDU
+from pymodbus.pdu.pdu import ExceptionResponse
+from pymodbus.server import ModbusTcpServer
+from pymodbus.server.requesthandler import ServerRequestHandler
+from capture import FLAG_CACHE_HIT, FLAG_FAULT, RESULT_CLOSED, RESULT_NO_RESPONSE, RESULT_OK, TransactionCapture
+from faults import FAULT_CLOSE, FAULT_DROP, FAULT_EXCEPTION, FaultInjector
+from response_cache import READ_TABLES, ReadResponseCache
+
+logger = logging.getLogger(__name__)
+
+class CachedResponse(ModbusPDU):
+    """Response PDU whose payload was encoded earlier and is sent as-is."""
+
+    def __init__(self, function_code: int, payload: bytes, dev_id: int, transaction_id: int):
+        super().__init__(dev_id=dev_id, transaction_id=transaction_id)
+        self.function_code = function_code
+        self.payload = payload
+
+    def encode(self) -> bytes:
+        return self.payload
+
+    def decode(self, data: bytes) -> None:
+        self.payload = data
+
+class SimulatorRequestHandler(ServerRequestHandler):
+    """
+    Per-connection handler that applies fault injection rules, answers repeated
+    reads from the response cache and records every transaction in the capture
+    buffer while capture is on.
+    """
+
+    peer: Optional[Tuple] = None
+
+    def callback_connected(self) -> None:
+        super().callback_connected()
+        self.peer = self.transport.get_extra_info('peername') if self.transport else None
+
+    async def handle_request(self):
+        pdu = self.last_pdu
+        if not pdu:
+            return
+        if self.server.broadcast_enable and not pdu.dev_id:
+            await super().handle_request()
+            return
+
+        start = time.perf_counter()
+        count = pdu.count or 1
+        closed = False
+        fault = None
+        faults: Optional[FaultInjector] = self.server.faults
+        if faults is not None and faults.active:
+            fault = faults.evaluate(pdu.dev_id, pdu.function_code, pdu.address, count)
+
+        if fault is None:
+            response, flags = await self.build_response(pdu)
+        else:
+            delay, action, exception_code = fault
+            if delay:
+                await asyncio.sleep(delay)
+            flags = FLAG_FAULT
+            if action == FAULT_CLOSE:
+                response, closed = None, True
+                if self.transport:
+                    self.transport.close()
+            elif action == FAULT_DROP:
+                response = None
+            elif action == FAULT_EXCEPTION:
+                response = ExceptionResponse(pdu.function_code, exception_code)
+                response.transaction_id = pdu.transaction_id
+                response.dev_id = pdu.dev_id
+            else:
+                response, cache_flags = await self.build_response(pdu)
+                flags |= cache_flags
+        if response is not None:
+            self.server_send(response, self.last_addr)
+
+        capture: Optional[TransactionCapture] = self.server.capture
+        if capture is not None and capture.enabled:
+            if closed:
+                result = RESULT_CLOSED
+            elif response is None:
+                result = RESULT_NO_RESPONSE
+            elif response.isError():
+                result = response.exception_code
+            else:
+                result = RESULT_OK
+            capture.record(self.peer, pdu.dev_id, pdu.function_code, pdu.address, count,
+                           result, flags, time.perf_counter() - start)
+
+    async def build_response(self, pdu: ModbusPDU) -> Tuple[Optional[ModbusPDU], int]:
+        """Response to send (None for no response) and capture flags."""
+        cache: Optional[ReadResponseCache] = self.server.response_cache
+        key = None
+        if cache is not None and cache.enabled and pdu.function_code in READ_TABLES:
+            key = (pdu.dev_id, pdu.function_code, pdu.address, pdu.count)
+            payload = cache.get(key)
+            if payload is not None:
+                return CachedResponse(pdu.function_code, payload, pdu.dev_id, pdu.transaction_id), FLAG_CACHE_HIT
+            version = cache.version(READ_TABLES[pdu.function_code])
+
+        response = await self.execute_request(pdu)
+        if response is None:
+            return None, 0
+        response.transaction_id = pdu.transaction_id
+        response.dev_id = pdu.dev_id
+
+        if key is not None and not response.isError():
+            payload = response.encode()
+            cache.put(key, payload, version)
+            response = CachedResponse(response.function_code, payload, pdu.dev_id, pdu.transaction_id)
+        return response, 0
+
+    async def execute_request(self, pdu: ModbusPDU) -> Optional[ModbusPDU]:
+        """Run a request against the datastore, mapping failures to exception responses."""
+        try:
+            context = self.server.context[pdu.dev_id]
+            return await pdu.update_datastore(context)
+        except NoSuchSlaveException:
+            logger.error(f"Requested slave does not exist: {pdu.dev_id}")
+            if self.server.ignore_missing_slaves:
+                return None  # the client will simply timeout waiting for a response
+            return ExceptionResponse(0x00, ExceptionResponse.GATEWAY_NO_RESPONSE)
+        except Exception as e:
+            logger.error(f"Datastore unable to fulfill request: {e}; {traceback.format_exc()}")
+            return ExceptionResponse(0x00, ExceptionResponse.SLAVE_FAILURE)
+
+class SimulatorTcpServer(ModbusTcpServer):
+    """Modbus TCP server using SimulatorRequestHandler for every connection."""
+
+    def __init__(self, context, response_cache: Optional[ReadResponseCache] = None,
+                 capture: Optional[TransactionCapture] = None, faults: Optional[FaultInjector] = None, **kwargs):
+        super().__init__(context, **kwargs)
+        self.response_cache = response_cache
+        self.capture = capture
+        self.faults = faults
+
+    def callback_new_connection(self):
+        if self.trace_connect:
+            self.trace_connect(True)
+        return SimulatorRequestHandler(
+            self,
+            self.trace_packet,
+            self.trace_pdu,
+            self.trace_connect
+        )
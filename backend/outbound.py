@@ -0,0 +1,185 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from engineio import packet as eio_packet
+from socketio import packet
+
+logger = logging.getLogger(__name__)
+
+# Events carrying a full collection snapshot; a newer one makes any queued one obsolete
+MERGE_EVENTS = {
+    'circuit_breakers',
+    'telesignals',
+    'telemetries',
+    'tap_changers',
+    'get_initial_data_response',
+    'data_manifest',
+}
+
+class ClientOutbox:
+    """Bounded queue of pending events for one Socket.IO client."""
+
+    def __init__(self, sid: str, max_depth: int):
+        self.sid = sid
+        self.max_depth = max_depth
+        self.pending: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.peak_depth = 0
+        self.last_send_ms = 0.0
+
+    def push(self, key, event: str, data: Any):
+        if event in MERGE_EVENTS and event in self.pending:
+            # Replace the queued snapshot in place so it keeps its turn
+            self.pending[event] = (event, data)
+            self.merged += 1
+            return
+
+        self.pending[key] = (event, data)
+        if len(self.pending) > self.max_depth:
+            self._drop_oldest()
+        self.peak_depth = max(self.peak_depth, len(self.pending))
+        self.ready.set()
+
+    def _drop_oldest(self):
+        # Prefer dropping a one-off event over a snapshot the client needs to stay in sync
+        for key, (event, _) in self.pending.items():
+            if event not in MERGE_EVENTS:
+                del self.pending[key]
+                break
+        else:
+            self.pending.popitem(last=False)
+        self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "sid": self.sid,
+            "depth": len(self.pending),
+            "peak_depth": self.peak_depth,
+            "sent": self.sent,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "last_send_ms": round(self.last_send_ms, 3),
+        }
+
+class OutboundBroadcaster:
+    """
+    Per-client outbound queues for Socket.IO.
+
+    `emit` only enqueues and never awaits, so the simulation and monitoring loops
+    are not slowed down by a client on a slow link. Each client has its own drain
+    task, which hands the next event to Engine.IO only once the client's Engine.IO
+    packet queue has been taken by its transport. A snapshot is encoded once and
+    the same packets go to every client. Until then events wait in the
+    outbox: queued snapshots are merged (only the newest is sent) and other events
+    are dropped oldest-first once the outbox is full.
+    """
+
+    def __init__(self, sio, max_depth: int = 32):
+        self.sio = sio
+        self.max_depth = max_depth
+        self.outboxes: Dict[str, ClientOutbox] = {}
+        self._seq = itertools.count()
+        # Called with (event, data, room) for clients that are not connected to this process
+        self.relay: Optional[Callable[[str, Any, str], None]] = None
+        # Newest encoded packets per snapshot event, as (data, packets)
+        self._encoded: Dict[str, Tuple[Any, List[eio_packet.Packet]]] = {}
+        self.encodes = 0
+        self.encode_hits = 0
+
+    def register(self, sid: str):
+        outbox = ClientOutbox(sid, self.max_depth)
+        outbox.task = asyncio.create_task(self._drain(outbox))
+        self.outboxes[sid] = outbox
+
+    def unregister(self, sid: str):
+        outbox = self.outboxes.pop(sid, None)
+        if outbox and outbox.task:
+            outbox.task.cancel()
+
+    def has_recipients(self, room: Optional[str] = None) -> bool:
+        return room in self.outboxes if room is not None else bool(self.outboxes)
+
+    def emit(self, event: str, data: Any, room: Optional[str] = None):
+        """Queue an event for one client (`room`) or for every connected client."""
+        key = event if event in MERGE_EVENTS else next(self._seq)
+        if room is not None:
+            outbox = self.outboxes.get(room)
+            if outbox:
+                outbox.push(key, event, data)
+            elif self.relay:
+                self.relay(event, data, room)
+            return
+        for outbox in self.outboxes.values():
+            outbox.push(key, event, data)
+
+    def _transport_queue(self, sid: str) -> Optional[asyncio.Queue]:
+        """Engine.IO packet queue of a client, None if it is gone."""
+        eio_sid = self.sio.manager.eio_sid_from_sid(sid, '/')
+        socket = self.sio.eio.sockets.get(eio_sid) if eio_sid else None
+        return socket.queue if socket else None
+
+    async def _transport_idle(self, sid: str):
+        # Engine.IO queues packets without limit; a stalled client's packets stay
+        # there until its transport polls or its websocket write completes
+        queue = self._transport_queue(sid)
+        if queue is not None:
+            await queue.join()
+
+    def _encode(self, event: str, data: Any) -> List[eio_packet.Packet]:
+        """Engine.IO packets of an event. Snapshots are encoded once and shared by every client."""
+        if event in MERGE_EVENTS:
+            cached = self._encoded.get(event)
+            if cached is not None and cached[0] is data:
+                self.encode_hits += 1
+                return cached[1]
+        self.encodes += 1
+        # Like sio.emit, a tuple is sent as several arguments
+        arguments = list(data) if isinstance(data, tuple) else [] if data is None else [data]
+        encoded = self.sio.packet_class(packet.EVENT, namespace='/', data=[event] + arguments).encode()
+        packets = [eio_packet.Packet(eio_packet.MESSAGE, part) for part in (encoded if isinstance(encoded, list) else [encoded])]
+        if event in MERGE_EVENTS:
+            # Holding on to `data` keeps the identity check valid until a newer snapshot replaces it
+            self._encoded[event] = (data, packets)
+        return packets
+
+    async def _send(self, sid: str, event: str, data: Any):
+        eio_sid = self.sio.manager.eio_sid_from_sid(sid, '/')
+        if eio_sid is None:
+            return
+        for pkt in self._encode(event, data):
+            await self.sio.eio.send_packet(eio_sid, pkt)
+
+    async def _drain(self, outbox: ClientOutbox):
+        while True:
+            await outbox.ready.wait()
+            outbox.ready.clear()
+            while outbox.pending:
+                await self._transport_idle(outbox.sid)
+                if not outbox.pending:
+                    break
+                _, (event, data) = outbox.pending.popitem(last=False)
+                start = time.perf_counter()
+                try:
+                    await self._send(outbox.sid, event, data)
+                    outbox.sent += 1
+                except Exception as e:
+                    logger.error(f"Error sending {event} to {outbox.sid}: {e}")
+                outbox.last_send_ms = (time.perf_counter() - start) * 1000
+
+    def stats(self) -> dict:
+        clients = [outbox.stats() for outbox in self.outboxes.values()]
+        return {
+            "max_depth": self.max_depth,
+            "clients": clients,
+            "total_depth": sum(client["depth"] for client in clients),
+            "total_dropped": sum(client["dropped"] for client in clients),
+            "encodes": self.encodes,
+            "encode_hits": self.encode_hits,
+        }
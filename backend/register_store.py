@@ -0,0 +1,90 @@
+import struct
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+from pymodbus.datastore import ModbusSlaveContext
+
+# Register tables by name, mapped to the function code used with store.getValues/setValues
+TABLES: Dict[str, int] = {
+    "coils": 1,
+    "discrete_inputs": 2,
+    "holding_registers": 3,
+    "input_registers": 4,
+    "co": 1,
+    "di": 2,
+    "hr": 3,
+    "ir": 4,
+}
+
+BIT_TABLES = (1, 2)
+
+class SimulatorSlaveContext(ModbusSlaveContext):
+    """
+    Slave context shared by the Modbus server thread and the asyncio loop.
+
+    Every read and write goes through one lock, so a batch applied with
+    `setValuesBatch` is seen by Modbus masters either completely or not at all.
+    Write listeners are called under the lock with (table, address, count)
+    for every write, whichever side it comes from.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.RLock()
+        self.write_listeners: List[Callable[[str, int, int], None]] = []
+
+    def getValues(self, fc_as_hex, address, count=1):
+        with self.lock:
+            return super().getValues(fc_as_hex, address, count)
+
+    def setValues(self, fc_as_hex, address, values):
+        with self.lock:
+            super().setValues(fc_as_hex, address, values)
+            self._notify(fc_as_hex, address, len(values))
+
+    def size(self, fc_as_hex) -> int:
+        """Number of addressable IOAs in the table for this function code."""
+        return len(self.store[self.decode(fc_as_hex)].values) - 1
+
+    def setValuesBatch(self, writes: Sequence[Tuple[int, int, List[int]]]):
+        """Apply several (function code, address, values) writes under a single lock."""
+        with self.lock:
+            for fc_as_hex, address, values in writes:
+                super().setValues(fc_as_hex, address, values)
+                self._notify(fc_as_hex, address, len(values))
+
+    def _notify(self, fc_as_hex, address, count):
+        table = self.decode(fc_as_hex)
+        for listener in self.write_listeners:
+            listener(table, address, count)
+
+def resolve_table(name: str) -> int:
+    """Return the function code for a table name, or raise ValueError."""
+    fc = TABLES.get(name.lower())
+    if fc is None:
+        raise ValueError(f"Unknown register table '{name}'")
+    return fc
+
+def check_range(store: SimulatorSlaveContext, fc: int, start: int, count: int):
+    """Raise ValueError unless IOAs start..start+count-1 exist in the table."""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    size = store.size(fc)
+    if start < 1 or start + count - 1 > size:
+        raise ValueError(f"Range {start}..{start + count - 1} outside table (1..{size})")
+
+def check_values(fc: int, values: Sequence[int]):
+    """Raise ValueError if a value does not fit the table's data type."""
+    limit = 1 if fc in BIT_TABLES else 0xFFFF
+    for value in values:
+        if not 0 <= int(value) <= limit:
+            raise ValueError(f"Value {value} out of range 0..{limit}")
+
+def pack_values(fc: int, values: Sequence[int]) -> bytes:
+    """Encode values the way Modbus does: packed LSB-first bits or big-endian words."""
+    if fc in BIT_TABLES:
+        packed = bytearray((len(values) + 7) // 8)
+        for i, value in enumerate(values):
+            if value:
+                packed[i // 8] |= 1 << (i % 8)
+        return bytes(packed)
+    return struct.pack(f">{len(values)}H", *(int(value) & 0xFFFF for value in values))
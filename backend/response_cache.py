@@ -0,0 +1,86 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+# Register table touched by each read function code, as decoded by the slave context
+READ_TABLES: Dict[int, str] = {1: "c", 2: "d", 3: "h", 4: "i"}
+
+CacheKey = Tuple[int, int, int, int]  # (unit, function code, start, count)
+
+class ReadResponseCache:
+    """
+    Encoded read-response payloads keyed by (unit, function code, start, count).
+
+    Entries are dropped as soon as a write touches any address they cover, so a
+    hit always matches the current register contents. Each table carries a
+    version number that moves on every write; a payload built from an older
+    version is not stored, which closes the race between reading the registers
+    and inserting the result.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.enabled = max_entries > 0
+        self._entries: Dict[CacheKey, bytes] = {}
+        self._ranges: Dict[str, Dict[CacheKey, Tuple[int, int]]] = {table: {} for table in READ_TABLES.values()}
+        self._versions: Dict[str, int] = {table: 0 for table in READ_TABLES.values()}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: CacheKey) -> Optional[bytes]:
+        payload = self._entries.get(key)
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    def version(self, table: str) -> int:
+        return self._versions[table]
+
+    def put(self, key: CacheKey, payload: bytes, version: int):
+        table = READ_TABLES[key[1]]
+        with self._lock:
+            if not self.enabled or self._versions[table] != version:
+                return
+            if len(self._entries) >= self.max_entries:
+                # Evict the oldest entry; hot ranges are re-added on their next poll
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+            self._entries[key] = payload
+            self._ranges[table][key] = (key[2], key[2] + key[3])
+
+    def invalidate(self, table: str, address: int, count: int):
+        """Drop every entry of `table` that overlaps address..address+count-1."""
+        if table not in self._versions:
+            return
+        end = address + count
+        with self._lock:
+            self._versions[table] += 1
+            ranges = self._ranges[table]
+            stale = [key for key, (start, stop) in ranges.items() if start < end and address < stop]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            for table in self._ranges:
+                self._versions[table] += 1
+                self._ranges[table].clear()
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+    def _drop(self, key: CacheKey):
+        self._entries.pop(key, None)
+        self._ranges[READ_TABLES[key[1]]].pop(key, None)
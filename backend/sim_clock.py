@@ -0,0 +1,66 @@
+import asyncio
+import random
+import time
+from typing import Optional
+
+CLOCK_MODES = ("realtime", "accelerated", "discrete")
+
+class SimulationClock:
+    """
+    Time source for everything driven by the simulation.
+
+    - realtime: simulated time follows the wall clock.
+    - accelerated: simulated time runs `speed` times faster than the wall clock.
+    - discrete: simulated time only moves when the simulation sleeps, so loops run
+      as fast as possible and a run with the same seed is reproducible.
+
+    Simulated time starts at the wall-clock epoch, so timestamps stay comparable
+    with real ones. The Modbus server is not affected and keeps answering in real
+    time in every mode.
+    """
+
+    def __init__(self, mode: str = "realtime", speed: float = 1.0, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+        self.seed = seed
+        self._sim_base = time.time()
+        self._real_base = time.monotonic()
+        self.mode = "realtime"
+        self.speed = 1.0
+        self.configure(mode, speed)
+
+    def now(self) -> float:
+        """Current simulated time in seconds since the epoch."""
+        if self.mode == "discrete":
+            return self._sim_base
+        return self._sim_base + (time.monotonic() - self._real_base) * self.speed
+
+    async def sleep(self, seconds: float):
+        """Sleep for `seconds` of simulated time."""
+        if self.mode == "discrete":
+            self._sim_base += seconds
+            await asyncio.sleep(0)  # let the event loop serve clients between steps
+        else:
+            await asyncio.sleep(seconds / self.speed)
+
+    def configure(self, mode: Optional[str] = None, speed: Optional[float] = None):
+        """Switch mode and/or speed without a jump in simulated time."""
+        mode = mode or self.mode
+        if mode not in CLOCK_MODES:
+            raise ValueError(f"Unknown clock mode '{mode}', expected one of {', '.join(CLOCK_MODES)}")
+        if speed is not None and speed <= 0:
+            raise ValueError("speed must be positive")
+
+        self._sim_base = self.now()
+        self._real_base = time.monotonic()
+        self.mode = mode
+        if mode == "realtime":
+            self.speed = 1.0
+        elif speed is not None:
+            self.speed = speed
+
+    def reseed(self, seed: Optional[int]):
+        self.seed = seed
+        self.random.seed(seed)
+
+    def status(self) -> dict:
+        return {"mode": self.mode, "speed": self.speed, "seed": self.seed, "now": self.now(), "wall_time": time.time()}
@@ -0,0 +1,104 @@
+import math
+import uuid
+from typing import Callable, Collection, Dict, List, Optional
+from pydantic import BaseModel
+
+class CollectionSnapshots:
+    """
+    Versioned, cached snapshots of the item collections.
+
+    Any change to a collection must `touch` it, which bumps its version and
+    drops the cached list. The list of dicts is built the first time it is
+    needed after a change and then shared by broadcasts, `get_initial_data`
+    and page requests until the next change, so connecting clients do not each
+    serialize the whole configuration again.
+
+    Versions restart when the process does, so clients compare `epoch` as well
+    to notice a restart.
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], Collection[BaseModel]]], page_size: int = 500, max_page_size: int = 5000):
+        self.sources = sources
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.epoch = uuid.uuid4().hex[:12]
+        self._versions = {name: 0 for name in sources}
+        self._items: Dict[str, Optional[List[dict]]] = {name: None for name in sources}
+        self.builds = 0
+        self.hits = 0
+
+    def touch(self, collection: str):
+        self._versions[collection] += 1
+        self._items[collection] = None
+
+    def replace(self, collection: str, items: List[dict], version: int):
+        """Install a snapshot built elsewhere, e.g. received from the simulation process."""
+        self._versions[collection] = version
+        self._items[collection] = items
+
+    def version(self, collection: str) -> int:
+        return self._versions[collection]
+
+    def items(self, collection: str) -> List[dict]:
+        """Serialized items of a collection. Treat the list as read-only, it is shared."""
+        cached = self._items[collection]
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.builds += 1
+        items = self._items[collection] = [item.model_dump() for item in self.sources[collection]()]
+        return items
+
+    def event(self, collection: str) -> tuple:
+        """Arguments of a collection broadcast: the items, then their epoch and version."""
+        return self.items(collection), {"epoch": self.epoch, "version": self._versions[collection]}
+
+    def total(self, collection: str) -> int:
+        """Number of items, counted without building a snapshot that may not be needed."""
+        cached = self._items[collection]
+        return len(cached) if cached is not None else len(self.sources[collection]())
+
+    def _page_size(self, page_size: Optional[int]) -> int:
+        if page_size is None:
+            return self.page_size
+        if not 1 <= page_size <= self.max_page_size:
+            raise ValueError(f"page_size must be between 1 and {self.max_page_size}")
+        return page_size
+
+    def manifest(self, page_size: Optional[int] = None) -> dict:
+        """Version and size of every collection, enough for a client to decide what to fetch."""
+        page_size = self._page_size(page_size)
+        collections = {}
+        for name in self.sources:
+            total = self.total(name)
+            collections[name] = {"version": self._versions[name], "total": total, "pages": math.ceil(total / page_size)}
+        return {"epoch": self.epoch, "page_size": page_size, "collections": collections}
+
+    def page(self, collection: str, page: int = 1, page_size: Optional[int] = None) -> dict:
+        """One page (numbered from 1) of a collection; pages past the end are empty."""
+        if collection not in self.sources:
+            raise ValueError(f"Unknown collection '{collection}', expected one of {', '.join(self.sources)}")
+        if page < 1:
+            raise ValueError("page must be 1 or greater")
+        page_size = self._page_size(page_size)
+        items = self.items(collection)
+        start = (page - 1) * page_size
+        return {
+            "epoch": self.epoch,
+            "collection": collection,
+            "version": self._versions[collection],
+            "page": page,
+            "page_size": page_size,
+            "pages": math.ceil(len(items) / page_size),
+            "total": len(items),
+            "items": items[start:start + page_size],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "versions": dict(self._versions),
+            "cached": [name for name, items in self._items.items() if items is not None],
+            "builds": self.builds,
+            "hits": self.hits,
+        }
@@ -0,0 +1,110 @@
+import heapq
+import logging
+from typing import Dict, List, Tuple
+from data_models import TapChangerItem
+
+logger = logging.getLogger(__name__)
+
+# Raise/lower command and status encoding (double point)
+TAP_NEUTRAL = 0
+TAP_LOWER = 1
+TAP_RAISE = 2
+
+# Local/remote encoding used by `is_local_remote`
+TAP_LOCAL = 1
+TAP_REMOTE = 2
+
+class TapChangerEngine:
+    """
+    Event-driven raise/lower state machine for tap changers.
+
+    A command written by the master to `ioa_command_raise_lower` starts a tap
+    operation: the status register shows the direction while the mechanism
+    travels, and after `travel_time` seconds the position steps by one within
+    `value_low_limit`/`value_high_limit` and both registers return to neutral.
+    Pending operations live in a heap ordered by due time, so each tick only
+    touches the tap changers whose operation has finished.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._heap: List[Tuple[float, int, str]] = []
+        self._pending: Dict[str, Tuple[int, int]] = {}  # item_id -> (seq, command)
+        self._seq = 0
+
+    def is_moving(self, item_id: str) -> bool:
+        return item_id in self._pending
+
+    def handle_raise_lower(self, item: TapChangerItem, command: int, now: float) -> bool:
+        """Accept or reject a raise/lower command. Returns True if registers changed."""
+        if command not in (TAP_LOWER, TAP_RAISE) or self.is_moving(item.id):
+            return False
+
+        target = item.value + (1 if command == TAP_RAISE else -1)
+        if item.is_local_remote != TAP_REMOTE or item.auto_mode or not (item.value_low_limit <= target <= item.value_high_limit):
+            # Command refused: local control, automatic regulation or end position reached
+            self.store.setValues(3, item.ioa_command_raise_lower - 1, [TAP_NEUTRAL])
+            logger.info(f"Tap changer command rejected: {item.name} (IOA: {item.ioa_command_raise_lower}) command: {command}")
+            return True
+
+        self._seq += 1
+        self._pending[item.id] = (self._seq, command)
+        heapq.heappush(self._heap, (now + item.travel_time, self._seq, item.id))
+
+        item.status_raise_lower = command
+        self.store.setValues(3, item.ioa_status_raise_lower - 1, [command])
+        logger.info(f"Tap changer operating: {item.name} (IOA: {item.ioa_value}) command: {command}")
+        return True
+
+    def handle_auto_manual(self, item: TapChangerItem, command: int) -> bool:
+        """Apply an auto/manual command coil. Returns True if the mode changed."""
+        if item.is_local_remote != TAP_REMOTE:
+            self.store.setValues(1, item.ioa_command_auto_manual - 1, [int(item.auto_mode)])
+            return False
+
+        auto_mode = bool(command)
+        if item.auto_mode == auto_mode:
+            return False
+
+        item.auto_mode = auto_mode
+        self.store.setValues(1, item.ioa_status_auto_manual - 1, [int(auto_mode)])
+        logger.info(f"Tap changer mode changed: {item.name} auto_mode: {auto_mode}")
+        return True
+
+    def write_mode(self, item: TapChangerItem):
+        """Show `auto_mode` on the auto/manual status and command coils (1: auto, 0: manual)."""
+        self.store.setValues(1, item.ioa_status_auto_manual - 1, [int(item.auto_mode)])
+        self.store.setValues(1, item.ioa_command_auto_manual - 1, [int(item.auto_mode)])
+
+    def complete_due(self, tap_changers: Dict[str, TapChangerItem], now: float) -> List[TapChangerItem]:
+        """Finish every operation whose travel time has elapsed. Returns the tap changers that stepped."""
+        completed = []
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, item_id = heapq.heappop(self._heap)
+            pending = self._pending.get(item_id)
+            if pending is None or pending[0] != seq:
+                continue  # cancelled or superseded
+            del self._pending[item_id]
+
+            item = tap_changers.get(item_id)
+            if item is None:
+                continue
+
+            step = 1 if pending[1] == TAP_RAISE else -1
+            item.value = min(max(item.value + step, item.value_low_limit), item.value_high_limit)
+            item.status_raise_lower = TAP_NEUTRAL
+            self.store.setValues(3, item.ioa_value - 1, [item.value])
+            self.store.setValues(3, item.ioa_status_raise_lower - 1, [TAP_NEUTRAL])
+            self.store.setValues(3, item.ioa_command_raise_lower - 1, [TAP_NEUTRAL])
+
+            logger.info(f"Tap changer stepped: {item.name} (IOA: {item.ioa_value}) value: {item.value}")
+            completed.append(item)
+        return completed
+
+    def cancel(self, item_id: str):
+        """Drop a pending operation; its heap entry is skipped when it comes due."""
+        self._pending.pop(item_id, None)
+
+    def clear(self):
+        self._heap.clear()
+        self._pending.clear()
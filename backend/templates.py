@@ -0,0 +1,257 @@
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+from pydantic import BaseModel, ValidationError
+from data_models import CircuitBreakerItem, TeleSignalItem, TelemetryItem, TapChangerItem, DeviceTemplate, TemplateInstantiation
+from register_store import TABLES
+
+# Template item type -> (collection, model)
+ITEM_TYPES = {
+    "circuit_breaker": ("circuit_breakers", CircuitBreakerItem),
+    "telesignal": ("telesignals", TeleSignalItem),
+    "telemetry": ("telemetries", TelemetryItem),
+    "tap_changer": ("tap_changers", TapChangerItem),
+}
+
+TABLE_NAMES = {fc: name for name, fc in TABLES.items() if len(name) > 2}
+
+_CIRCUIT_BREAKER = {
+    "type": "circuit_breaker",
+    "name": "CB",
+    "offsets": {
+        "ioa_cb_status": 0, "ioa_cb_status_close": 1, "ioa_cb_status_dp": 0,
+        "ioa_control_open": 0, "ioa_control_close": 1, "ioa_control_dp": 0,
+        "ioa_local_remote_sp": 2, "ioa_local_remote_dp": 3,
+    },
+    "fields": {"is_sbo": False, "has_double_point": True, "has_local_remote_dp": True},
+}
+
+BUILTIN_TEMPLATES = [
+    {
+        "name": "bay",
+        "description": "Line bay: circuit breaker with single-point local/remote, protection trip, voltage and current",
+        "items": [
+            # ioa_local_remote_dp is a required field but not written without has_local_remote_dp
+            {**_CIRCUIT_BREAKER,
+             "offsets": {**_CIRCUIT_BREAKER["offsets"], "ioa_local_remote_dp": 2},
+             "fields": {**_CIRCUIT_BREAKER["fields"], "has_local_remote_dp": False}},
+            {"type": "telesignal", "name": "Protection Trip", "offsets": {"ioa": 3}, "fields": {"auto_mode": False}},
+            {"type": "telemetry", "name": "Voltage", "offsets": {"ioa": 1},
+             "fields": {"unit": "kV", "value": 150, "scale_factor": 0.1, "min_value": 140, "max_value": 160}},
+            {"type": "telemetry", "name": "Current", "offsets": {"ioa": 2},
+             "fields": {"unit": "A", "value": 200, "scale_factor": 1, "min_value": 0, "max_value": 1000}},
+        ],
+    },
+    {
+        "name": "feeder",
+        "description": "Distribution feeder: circuit breaker, overcurrent trip, current and power",
+        "items": [
+            _CIRCUIT_BREAKER,
+            {"type": "telesignal", "name": "Overcurrent Trip", "offsets": {"ioa": 4}, "fields": {"auto_mode": False}},
+            {"type": "telemetry", "name": "Current", "offsets": {"ioa": 1},
+             "fields": {"unit": "A", "value": 100, "scale_factor": 1, "min_value": 0, "max_value": 630}},
+            {"type": "telemetry", "name": "Active Power", "offsets": {"ioa": 2},
+             "fields": {"unit": "MW", "value": 5, "scale_factor": 0.01, "min_value": 0, "max_value": 20}},
+            {"type": "telemetry", "name": "Reactive Power", "offsets": {"ioa": 3},
+             "fields": {"unit": "MVAr", "value": 1, "scale_factor": 0.01, "min_value": 0, "max_value": 10}},
+        ],
+    },
+    {
+        "name": "transformer",
+        "description": "Power transformer: on-load tap changer, Buchholz trip, voltages and oil temperature",
+        "items": [
+            {"type": "tap_changer", "name": "OLTC",
+             "offsets": {
+                 "ioa_value": 0, "ioa_high_limit": 1, "ioa_low_limit": 2,
+                 "ioa_status_raise_lower": 3, "ioa_command_raise_lower": 4,
+                 "ioa_status_auto_manual": 0, "ioa_command_auto_manual": 1, "ioa_local_remote": 2,
+             },
+             "fields": {"value": 9, "value_high_limit": 17, "value_low_limit": 1, "auto_mode": False, "is_local_remote": 2}},
+            {"type": "telesignal", "name": "Buchholz Trip", "offsets": {"ioa": 3}, "fields": {"auto_mode": False}},
+            {"type": "telemetry", "name": "HV Voltage", "offsets": {"ioa": 5},
+             "fields": {"unit": "kV", "value": 150, "scale_factor": 0.1, "min_value": 140, "max_value": 160}},
+            {"type": "telemetry", "name": "LV Voltage", "offsets": {"ioa": 6},
+             "fields": {"unit": "kV", "value": 20, "scale_factor": 0.1, "min_value": 19, "max_value": 21}},
+            {"type": "telemetry", "name": "Oil Temperature", "offsets": {"ioa": 7},
+             "fields": {"unit": "°C", "value": 55, "scale_factor": 0.1, "min_value": 40, "max_value": 90}},
+        ],
+    },
+]
+
+def initial_writes(item: BaseModel) -> List[Tuple[int, int, int]]:
+    """(function code, IOA, value) writes that initialize the registers of a new item, as on import."""
+    if isinstance(item, CircuitBreakerItem):
+        writes = [
+            (2, item.ioa_cb_status, 0),
+            (2, item.ioa_cb_status_close, 0),
+            (1, item.ioa_control_open, 0),
+            (1, item.ioa_control_close, 0),
+        ]
+        if item.has_double_point:
+            if item.ioa_cb_status_dp is not None:
+                writes.append((4, item.ioa_cb_status_dp, 0))
+            if item.ioa_control_dp is not None:
+                writes.append((3, item.ioa_control_dp, 0))
+        writes.append((1, item.ioa_local_remote_sp, item.remote_sp))
+        if item.has_local_remote_dp:
+            writes.append((1, item.ioa_local_remote_dp, item.remote_dp))
+        return writes
+    if isinstance(item, TeleSignalItem):
+        return [(1, item.ioa, item.value)]
+    if isinstance(item, TelemetryItem):
+        return [(3, item.ioa, int(item.value / item.scale_factor))]
+    if isinstance(item, TapChangerItem):
+        return [
+            (3, item.ioa_value, item.value),
+            (3, item.ioa_high_limit, item.value_high_limit),
+            (3, item.ioa_low_limit, item.value_low_limit),
+            (3, item.ioa_status_raise_lower, 0),
+            (1, item.ioa_status_auto_manual, int(item.auto_mode)),
+            (1, item.ioa_local_remote, item.is_local_remote),
+            (3, item.ioa_command_raise_lower, 0),
+            (1, item.ioa_command_auto_manual, int(item.auto_mode)),
+        ]
+    raise TypeError(f"Unsupported item {type(item).__name__}")
+
+def occupied_addresses(items: Iterable[BaseModel]) -> Set[Tuple[int, int]]:
+    """(function code, IOA) of every register the items use."""
+    return {(fc, ioa) for item in items for fc, ioa, _ in initial_writes(item)}
+
+class CompiledItem:
+    __slots__ = ("collection", "prototype", "name", "offsets")
+
+    def __init__(self, collection: str, prototype: BaseModel, name: str, offsets: List[Tuple[str, int]]):
+        self.collection = collection
+        self.prototype = prototype
+        self.name = name
+        self.offsets = offsets
+
+class CompiledTemplate:
+    """
+    A device template validated once and reduced to what instantiation needs:
+    per item a validated prototype and its IOA offsets, and the register writes
+    of one instance relative to its base address. Stamping out copies only
+    copies prototypes with new IOAs; nothing is validated again.
+    """
+
+    def __init__(self, template: DeviceTemplate):
+        if not template.name or not template.items:
+            raise ValueError("A template needs a name and at least one item")
+        self.template = template
+        self.items: List[CompiledItem] = []
+        self.writes: List[Tuple[int, int, int]] = []  # (function code, offset, value)
+        self.tables: Set[int] = set()  # function codes written
+        used = set()
+
+        for entry in template.items:
+            if entry.type not in ITEM_TYPES:
+                raise ValueError(f"Unknown item type '{entry.type}', expected one of {', '.join(ITEM_TYPES)}")
+            collection, model = ITEM_TYPES[entry.type]
+            for field, offset in entry.offsets.items():
+                if field not in model.model_fields or not (field == "ioa" or field.startswith("ioa_")):
+                    raise ValueError(f"'{field}' is not an IOA field of {entry.type}")
+                if offset < 0:
+                    raise ValueError(f"Offset of '{field}' in '{entry.name}' must not be negative")
+            overlap = {"id", "name"} | entry.offsets.keys()
+            if overlap & entry.fields.keys():
+                raise ValueError(f"Fields of '{entry.name}' may not set {', '.join(sorted(overlap & entry.fields.keys()))}")
+
+            # Validate a prototype at base address 1; instances only differ in their IOAs
+            try:
+                prototype = model(id="prototype", name=entry.name, **entry.fields,
+                                  **{field: offset + 1 for field, offset in entry.offsets.items()})
+            except ValidationError as e:
+                raise ValueError(f"Invalid item '{entry.name}': {e}")
+            self.items.append(CompiledItem(collection, prototype, entry.name, list(entry.offsets.items())))
+
+            for fc, ioa, value in initial_writes(prototype):
+                if (fc, ioa) in used:
+                    raise ValueError(f"'{entry.name}' uses {TABLE_NAMES[fc]} offset {ioa - 1}, which another item of the template already uses")
+                used.add((fc, ioa))
+                self.writes.append((fc, ioa - 1, value))
+                self.tables.add(fc)
+
+        self.span = max(offset for item in self.items for _, offset in item.offsets) + 1
+
+    def instantiate(self, request: TemplateInstantiation, table_size: Callable[[int], int],
+                    occupied: Set[Tuple[int, int]]) -> Tuple[Dict[str, List[BaseModel]], List[Tuple[int, int, List[int]]]]:
+        """
+        Items of `request.count` instances grouped by collection, and the register
+        writes initializing them as (function code, address, values) for
+        `setValuesBatch`. Raises ValueError if the instances do not fit the tables
+        or use a (function code, IOA) in `occupied`.
+        """
+        stride = self.span if request.stride is None else request.stride
+        if request.count < 1 or request.base_address < 1:
+            raise ValueError("count and base_address must be at least 1")
+        if stride < self.span:
+            raise ValueError(f"stride {stride} is smaller than the template's address span {self.span}, instances would overlap")
+        last_base = request.base_address + (request.count - 1) * stride
+        # Every instance reserves its whole span, including offsets the template does not write
+        for fc in self.tables:
+            size = table_size(fc)
+            if last_base + self.span - 1 > size:
+                raise ValueError(f"{request.count} instances from IOA {request.base_address} with stride {stride} "
+                                 f"exceed the {TABLE_NAMES[fc]} table (1..{size})")
+
+        prefix = request.name or self.template.name
+        items: Dict[str, List[BaseModel]] = {item.collection: [] for item in self.items}
+        registers: Dict[int, Dict[int, int]] = {fc: {} for fc in self.tables}
+        for k in range(request.count):
+            number = request.first_number + k
+            base = request.base_address + k * stride
+            id_prefix = f"{self.template.name}-{request.unit_id}-{number}"
+            for index, item in enumerate(self.items):
+                update = {field: base + offset for field, offset in item.offsets}
+                update["id"] = f"{id_prefix}-{index}"
+                update["name"] = f"{prefix} {number} {item.name}"
+                items[item.collection].append(item.prototype.model_copy(update=update))
+            for fc, offset, value in self.writes:
+                if (fc, base + offset) in occupied:
+                    raise ValueError(f"Instance {number} would use {TABLE_NAMES[fc]} IOA {base + offset}, "
+                                     f"which an existing item already uses")
+                registers[fc][base + offset - 1] = value
+        return items, coalesce(registers)
+
+    def describe(self) -> dict:
+        return {
+            **self.template.model_dump(),
+            "span": self.span,
+            "registers": {TABLE_NAMES[fc]: sum(1 for write in self.writes if write[0] == fc) for fc in sorted(self.tables)},
+        }
+
+def coalesce(registers: Dict[int, Dict[int, int]]) -> List[Tuple[int, int, List[int]]]:
+    """Turn {function code: {address: value}} into one write per run of consecutive addresses."""
+    writes: List[Tuple[int, int, List[int]]] = []
+    for fc, values in registers.items():
+        run_start, run = None, []
+        for address in sorted(values):
+            if run and address != run_start + len(run):
+                writes.append((fc, run_start, run))
+                run = []
+            if not run:
+                run_start = address
+            run.append(values[address])
+        if run:
+            writes.append((fc, run_start, run))
+    return writes
+
+class TemplateLibrary:
+    """Device templates by name, compiled when they are defined."""
+
+    def __init__(self, templates: List[dict] = BUILTIN_TEMPLATES):
+        self.compiled: Dict[str, CompiledTemplate] = {}
+        for template in templates:
+            self.define(DeviceTemplate(**template))
+
+    def define(self, template: DeviceTemplate) -> CompiledTemplate:
+        compiled = self.compiled[template.name] = CompiledTemplate(template)
+        return compiled
+
+    def remove(self, name: str) -> bool:
+        return self.compiled.pop(name, None) is not None
+
+    def get(self, name: str) -> CompiledTemplate:
+        """Raises KeyError for an unknown template."""
+        return self.compiled[name]
+
+    def describe(self) -> List[dict]:
+        return [compiled.describe() for compiled in self.compiled.values()]
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from socketio import packet
+from outbound import OutboundBroadcaster
+
+class StalledSocketIO:
+    """Stand-in for the Socket.IO server whose client transports take packets only when told to."""
+
+    packet_class = packet.Packet
+
+    def __init__(self, clients=("client",)):
+        self.queues = {"eio-" + sid: asyncio.Queue() for sid in clients}
+        self.queue = self.queues["eio-" + clients[0]]
+        self.manager = SimpleNamespace(eio_sid_from_sid=lambda sid, namespace: "eio-" + sid)
+        self.eio = SimpleNamespace(sockets={eio_sid: SimpleNamespace(queue=queue) for eio_sid, queue in self.queues.items()},
+                                   send_packet=self.send_packet)
+        self.delivered = []
+
+    async def send_packet(self, eio_sid, pkt):
+        socket = self.eio.sockets.get(eio_sid)
+        if socket is not None:
+            await socket.queue.put(pkt)
+
+    def take(self):
+        while not self.queue.empty():
+            pkt = self.queue.get_nowait()
+            # Socket.IO event packets are "2" followed by the JSON array [event, data]
+            self.delivered.append(tuple(json.loads(pkt.data[1:])))
+            self.queue.task_done()
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+def test_stalled_client_merges_snapshots_and_drops_events():
+    async def scenario():
+        sio = StalledSocketIO()
+        outbound = OutboundBroadcaster(sio, max_depth=4)
+        outbound.register("client")
+
+        outbound.emit("telemetries", [0])
+        await settle()
+        # The first snapshot is handed to the transport, which does not take it
+        for value in range(1, 50):
+            outbound.emit("telemetries", [value])
+            outbound.emit("notice", value)
+        await settle()
+
+        outbox = outbound.outboxes["client"]
+        assert outbox.sent == 1
+        assert len(outbox.pending) == 4
+        assert outbox.merged == 48
+        assert outbox.dropped == 49 - 3
+
+        # Once the transport catches up the newest snapshot follows, not the merged ones
+        for _ in range(10):
+            sio.take()
+            await settle()
+        snapshots = [data for event, data in sio.delivered if event == "telemetries"]
+        assert snapshots == [[0], [49]]
+        assert [data for event, data in sio.delivered if event == "notice"] == [47, 48, 49]
+        assert outbox.sent == 5
+        outbound.unregister("client")
+
+    asyncio.run(scenario())
+
+def test_gone_transport_does_not_block():
+    async def scenario():
+        sio = StalledSocketIO()
+        sio.eio.sockets.clear()
+        outbound = OutboundBroadcaster(sio, max_depth=4)
+        outbound.register("client")
+        for value in range(3):
+            outbound.emit("notice", value)
+        await settle()
+        assert outbound.outboxes["client"].sent == 3
+        outbound.unregister("client")
+
+    asyncio.run(scenario())
+
+def test_snapshot_is_encoded_once_for_all_clients():
+    async def scenario():
+        sio = StalledSocketIO(clients=("a", "b", "c"))
+        outbound = OutboundBroadcaster(sio, max_depth=4)
+        for sid in ("a", "b", "c"):
+            outbound.register(sid)
+        snapshot = [{"id": "1", "value": 5}]
+        outbound.emit("telemetries", snapshot)
+        await settle()
+        packets = [queue.get_nowait() for queue in sio.queues.values()]
+        assert packets[0] is packets[1] is packets[2]
+        assert outbound.encodes == 1 and outbound.encode_hits == 2
+        for sid in ("a", "b", "c"):
+            outbound.unregister(sid)
+
+    asyncio.run(scenario())
@@ -3,7 +3,7 @@ import socket from './socket';
 import { CircuitBreaker } from './components/CircuitBreakerItem';
 import { TeleSignal } from './components/TeleSignalItem';
 import { Telemetry } from './components/TeleMetryItem';
-import { CircuitBreakerItem, TapChangerItem, TeleSignalItem, TelemetryItem } from './lib/items';
+import { CircuitBreakerItem, DataManifest, DataPage, TapChangerItem, TeleSignalItem, TelemetryItem } from './lib/items';
 
 import { DndContext, closestCenter, DragEndEvent } from '@dnd-kit/core';
 import { SortableContext, arrayMove, verticalListSortingStrategy } from '@dnd-kit/sortable';
@@ -19,6 +19,9 @@ import { DeleteConfirmDialog } from './components/DeleteConfirmDialog';
 import { TbDragDrop } from "react-icons/tb";
 import { TapChanger } from './components/TapChangerItem';
 
+// How often a paged fetch starts over because its collection changed between pages
+const MAX_FETCH_RESTARTS = 3;
+
 function App() {
   const [circuitBreakers, setCircuitBreakers] = useState<CircuitBreakerItem[]>([]);
   const [teleSignals, setTeleSignals] = useState<TeleSignalItem[]>([]);
@@ -37,42 +40,114 @@ function App() {
   const [itemToDelete, setItemToDelete] = useState<{ id: string, type: 'circuit_breaker' | 'telesignal' | 'telemetry' | 'tap_changer' | null } | null>(null);
 
   useEffect(() => {
-    // Emit 'get_initial_data' to request initial data
-    socket.emit('get_initial_data');
-
-    // Listen for the response
-    socket.on('get_initial_data_response', (response: {
-      circuit_breakers: CircuitBreakerItem[];
-      telesignals: TeleSignalItem[];
-      telemetries: TelemetryItem[];
-      tap_changers: TapChangerItem[];
-    }) => {
-      console.log('Initial data received:', response);
-
-      // Update state with initial data
-      setCircuitBreakers(response.circuit_breakers || []);
-      setTeleSignals(response.telesignals || []);
-      setTeleMetries(response.telemetries || []);
-      setTapChangers(response.tap_changers || []);
-
-      // Initialize combined order properly
-      const initialCombinedOrder = [
-        ...(response.circuit_breakers || []).map(item => ({ id: item.id, type: 'circuit_breaker' })),
-        ...(response.tap_changers || []).map(item => ({ id: item.id, type: 'tap_changer' }))
-      ];
-      setCombinedOrder(initialCombinedOrder);
+    // Snapshot versions of the collections currently shown, and the collections being fetched page by page
+    let loaded: { epoch: string; versions: Record<string, number>; items: Record<string, unknown[]> } | null = null;
+    let fetching: Record<string, { version: number; items: unknown[]; restarts: number }> = {};
+    let pageSize = 0;
+
+    const requestPage = (collection: string, page: number) => {
+      socket.emit('get_data_page', { collection, page, page_size: pageSize });
+    };
+
+    const showCollection = (collection: string, items: unknown[]) => {
+      if (collection === 'circuit_breakers') setCircuitBreakers(items as CircuitBreakerItem[]);
+      else if (collection === 'telesignals') setTeleSignals(items as TeleSignalItem[]);
+      else if (collection === 'telemetries') setTeleMetries(items as TelemetryItem[]);
+      else if (collection === 'tap_changers') setTapChangers(items as TapChangerItem[]);
+
+      if (collection === 'circuit_breakers' || collection === 'tap_changers') {
+        setCombinedOrder([
+          ...((loaded?.items.circuit_breakers || []) as CircuitBreakerItem[]).map(item => ({ id: item.id, type: 'circuit_breaker' })),
+          ...((loaded?.items.tap_changers || []) as TapChangerItem[]).map(item => ({ id: item.id, type: 'tap_changer' }))
+        ]);
+      }
+    };
+
+    // The server sends a manifest on every (re)connect; only fetch the collections that changed
+    socket.on('data_manifest', (manifest: DataManifest) => {
+      if (!loaded || loaded.epoch !== manifest.epoch) {
+        loaded = { epoch: manifest.epoch, versions: {}, items: {} };
+        fetching = {};
+      }
+      pageSize = manifest.page_size;
+      for (const [collection, info] of Object.entries(manifest.collections)) {
+        if (loaded.versions[collection] !== info.version && !(collection in fetching)) {
+          fetching[collection] = { version: info.version, items: [], restarts: 0 };
+          requestPage(collection, 1);
+        }
+      }
+    });
+
+    // Pages are requested one at a time per collection, so a slow client never has many queued
+    socket.on('data_page', (page: DataPage) => {
+      const state = fetching[page.collection];
+      if (!loaded || !state || page.epoch !== loaded.epoch) {
+        return;
+      }
+      if (page.page === 1) {
+        state.version = page.version;
+        state.items = [];
+      } else if (page.version !== state.version) {
+        // The collection changed while it was being fetched. Start over a few times; a collection
+        // that keeps changing is broadcast in full anyway, which ends the fetch
+        if (state.restarts < MAX_FETCH_RESTARTS) {
+          state.restarts += 1;
+          requestPage(page.collection, 1);
+        } else {
+          delete fetching[page.collection];
+        }
+        return;
+      }
+      state.items.push(...page.items);
+      if (page.page < page.pages) {
+        requestPage(page.collection, page.page + 1);
+        return;
+      }
+
+      delete fetching[page.collection];
+      loaded.versions[page.collection] = state.version;
+      loaded.items[page.collection] = state.items;
+      showCollection(page.collection, state.items);
     });
 
+    // A full broadcast is newer than any page still on its way, so it ends the fetch of that collection
+    const collectionHandlers = ['circuit_breakers', 'telesignals', 'telemetries', 'tap_changers'].map(collection => {
+      const handler = (items: unknown[], snapshot?: { epoch: string; version: number }) => {
+        delete fetching[collection];
+        if (loaded && snapshot && snapshot.epoch === loaded.epoch) {
+          loaded.versions[collection] = snapshot.version;
+          loaded.items[collection] = items;
+        }
+      };
+      socket.on(collection, handler);
+      return [collection, handler] as const;
+    });
+
+    // Fetches lost with the connection are started again after the next manifest
+    const handleDisconnect = () => {
+      fetching = {};
+    };
+    socket.on('disconnect', handleDisconnect);
+
     // Handle errors
-    socket.on('get_initial_data_error', (error: unknown) => {
+    socket.on('data_page_error', (error: unknown) => {
       console.error('Error fetching initial data:', error);
+      fetching = {};
       alert('Failed to fetch initial data. Please check the console for details.');
     });
 
+    // The manifest of the first connection may have arrived before the listener was added
+    if (socket.connected) {
+      socket.emit('get_data_manifest');
+    }
+
     // Cleanup listeners on unmount
     return () => {
-      socket.off('get_initial_data_response');
-      socket.off('get_initial_data_error');
+      socket.off('data_manifest');
+      socket.off('data_page');
+      socket.off('disconnect', handleDisconnect);
+      socket.off('data_page_error');
+      collectionHandlers.forEach(([collection, handler]) => socket.off(collection, handler));
     };
   }, []);
 
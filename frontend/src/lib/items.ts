@@ -63,6 +63,8 @@ export interface TapChangerItem {
   ioa_low_limit: number;
   ioa_status_raise_lower: number;
   ioa_command_raise_lower: number;
+  status_raise_lower?: number;
+  travel_time?: number;
   interval: number;
   auto_mode: boolean;
   ioa_status_auto_manual: number;
@@ -71,4 +73,22 @@ export interface TapChangerItem {
   ioa_local_remote: number;
 }
 
-export type Item = CircuitBreakerItem | TeleSignalItem | TelemetryItem | TapChangerItem;
\ No newline at end of file
+export type Item = CircuitBreakerItem | TeleSignalItem | TelemetryItem | TapChangerItem;
+
+// Sent by the server on every (re)connect and in reply to 'get_data_manifest'
+export interface DataManifest {
+  epoch: string;
+  page_size: number;
+  collections: Record<string, { version: number; total: number; pages: number }>;
+}
+
+export interface DataPage {
+  epoch: string;
+  collection: string;
+  version: number;
+  page: number;
+  page_size: number;
+  pages: number;
+  total: number;
+  items: unknown[];
+}
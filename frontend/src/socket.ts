@@ -9,9 +9,15 @@ const backendPort =
     
 const socketUrl = `http://${backendHost}:${backendPort}`;
 
+// Set VITE_SOCKETIO_TRANSPORTS=websocket when the backend runs several API workers,
+// which only accept WebSocket connections
+const transports = (import.meta.env.VITE_SOCKETIO_TRANSPORTS || 'websocket,polling')
+  .split(',')
+  .map((transport: string) => transport.trim());
+
 console.log(`Creating socket connection to: ${socketUrl}`);
 const socket = io(socketUrl, {
-  transports: ['websocket', 'polling'],
+  transports,
   reconnectionAttempts: 10,
   reconnectionDelay: 1000,
   timeout: 20000,